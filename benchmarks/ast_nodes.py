@@ -0,0 +1,54 @@
+"""Measure the memory of a parsed program and the speed of walking it.
+
+Run on two commits to compare AST node layouts.
+
+    python benchmarks/ast_nodes.py [--statements 20000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lox.interpreter import interpret  # noqa: E402
+from lox.parser import parse  # noqa: E402
+from lox.scanner import scan_tokens  # noqa: E402
+
+STATEMENT = "a = (a + b * 3 - 4) / 2 + (b - 1) * (a + 1) / (b + 7);"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--statements", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    source = "\n".join(["var a = 1;", "var b = 2;"]
+                       + [STATEMENT] * args.statements + ["print a;"])
+    tokens = scan_tokens(source)
+
+    tracemalloc.start()
+    statements = parse(tokens)
+    ast_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            interpret(statements)
+        best = min(best, time.perf_counter() - start)
+
+    print(f"statements:  {len(statements)}")
+    print(f"AST memory:  {ast_bytes / 1024 / 1024:.1f} MB "
+          f"({ast_bytes / len(statements):.0f} bytes per statement)")
+    print(f"interpret:   {best:.3f} s "
+          f"({len(statements) / best:,.0f} statements/s)")
+
+
+if __name__ == '__main__':
+    main()
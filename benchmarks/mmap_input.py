@@ -0,0 +1,101 @@
+"""Compare reading a script into a str against memory-mapping its bytes.
+
+Every input path runs in a fresh interpreter so its peak RSS is measured in
+isolation. Only scanning is timed, that is the phase the input path changes.
+
+    python benchmarks/mmap_input.py [--size-mb 100] [--keep]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lox.scanner import bytes_tokens, map_file, scan_token_stream, scan_tokens  # noqa: E402
+
+STATEMENT = 'var value = (1 - (2 + 3) * 5) / 6 + counter * 2.5; print "line";\n'
+
+
+def read_str(path: str) -> int:
+    with open(path, "r") as file:
+        return len(scan_tokens(file.read()))
+
+
+def read_mmap(path: str) -> int:
+    with open(path, "rb") as file, map_file(file) as data:
+        return len(list(bytes_tokens(data)))
+
+
+def stream_str(path: str) -> int:
+    with open(path, "r") as file:
+        return sum(1 for _ in scan_token_stream(file))
+
+
+def stream_mmap(path: str) -> int:
+    with open(path, "rb") as file, map_file(file) as data:
+        return sum(1 for _ in bytes_tokens(data))
+
+
+MODES = {
+    "read": read_str,
+    "mmap": read_mmap,
+    "read-stream": stream_str,
+    "mmap-stream": stream_mmap,
+}
+
+
+def generate(path: str, size: int):
+    with open(path, "w") as file:
+        written = 0
+        while written < size:
+            file.write(STATEMENT)
+            written += len(STATEMENT)
+
+
+def measure(mode: str, path: str):
+    start = time.perf_counter()
+    tokens = MODES[mode](path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"tokens": tokens, "seconds": elapsed, "peak_kb": peak}))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--size-mb", type=float, default=100)
+    arg_parser.add_argument("--keep", action="store_true",
+                            help="keep the generated input file")
+    arg_parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    arg_parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.input)
+        return
+
+    handle, path = tempfile.mkstemp(suffix=".lox")
+    os.close(handle)
+    try:
+        generate(path, int(args.size_mb * 1024 * 1024))
+        print(f"{'mode':<12} {'tokens':>10} {'seconds':>9} {'peak MB':>9}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--measure", mode, "--input", path],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(f"{mode:<12} {result['tokens']:>10} "
+                  f"{result['seconds']:>9.2f} {result['peak_kb'] / 1024:>9.1f}")
+    finally:
+        if args.keep:
+            print(f"input kept at {path}")
+        else:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
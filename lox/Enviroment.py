@@ -1,9 +1,14 @@
 from lox.exceptions import RuntimeException
 from lox.token import Token
 
+# Marks a slot whose variable has not been defined yet, None is Lox's nil
+UNDEFINED = object()
+
 
 class Environment:
-    values: dict = {}
+
+    def __init__(self):
+        self.values: dict = {}
 
     def define(self, name: str, value: object):
         self.values[name] = value
@@ -20,3 +25,28 @@ class Environment:
             return
 
         raise RuntimeException(name, f"Undefined variable {name.lexeme}.")
+
+
+class SlotEnvironment:
+    """Variables stored by the slot the resolver gave them, not by name."""
+
+    def __init__(self):
+        self.values: list = []
+
+    def reserve(self, size: int):
+        if size > len(self.values):
+            self.values.extend([UNDEFINED] * (size - len(self.values)))
+
+    def define(self, slot: int, value: object):
+        self.values[slot] = value
+
+    def get(self, slot: int, name: Token) -> object:
+        value = self.values[slot]
+        if value is UNDEFINED:
+            raise RuntimeException(name, f"Undefined variable {name.lexeme}.")
+        return value
+
+    def assign(self, slot: int, name: Token, value: object):
+        if self.values[slot] is UNDEFINED:
+            raise RuntimeException(name, f"Undefined variable {name.lexeme}.")
+        self.values[slot] = value
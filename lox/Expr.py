@@ -1,62 +1,81 @@
 from dataclasses import dataclass
-from typing import Any, Callable
+from typing import Any, Callable, ClassVar
 
 from lox.token import Token
 
+ASSIGN = 0
+BINARY = 1
+GROUPING = 2
+LITERAL = 3
+UNARY = 4
+VARIABLE = 5
 
-@dataclass
+
+@dataclass(slots=True)
 class Expr:
+    kind: ClassVar[int] = -1
+
     def accept(self, visitor: "ExprVisitor")-> "Expr":
         return Expr()
 
 
-@dataclass
+@dataclass(slots=True)
 class Assign(Expr):
+    kind: ClassVar[int] = ASSIGN
     name: Token
     value: Expr
+    slot: int = -1
 
     def accept(self, visitor: "ExprVisitor") -> "Expr":
         return visitor.visit_assign_expr(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Binary(Expr):
+    kind: ClassVar[int] = BINARY
     left: Expr
     operator: Token
     right: Expr
+    operation: Callable | None = None
 
     def accept(self, visitor: "ExprVisitor") -> "Expr":
         return visitor.visit_binary_expr(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Grouping(Expr):
+    kind: ClassVar[int] = GROUPING
     expression: Expr
 
     def accept(self, visitor: "ExprVisitor") -> "Expr":
         return visitor.visit_grouping_expr(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expr):
+    kind: ClassVar[int] = LITERAL
     value: object
 
     def accept(self, visitor: "ExprVisitor") -> "Expr":
         return visitor.visit_literal_expr(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Expr):
+    kind: ClassVar[int] = UNARY
     operator: Token
     right: Expr
+    operation: Callable | None = None
 
     def accept(self, visitor: "ExprVisitor") -> "Expr":
         return visitor.visit_unary_expr(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Variable(Expr):
+    kind: ClassVar[int] = VARIABLE
     name: Token
+    slot: int = -1
 
     def accept(self, visitor: "ExprVisitor") -> "Expr":
         return visitor.visit_variable_expr(self, visitor)
@@ -71,3 +90,13 @@ class ExprVisitor:
     visit_unary_expr: Callable[[Unary, "ExprVisitor"], Any]
     visit_variable_expr: Callable[[Variable, "ExprVisitor"], Any]
 
+
+def expr_dispatch_table(visitor: ExprVisitor) -> list[Callable[[Any, Any], Any]]:
+    return [
+        visitor.visit_assign_expr,
+        visitor.visit_binary_expr,
+        visitor.visit_grouping_expr,
+        visitor.visit_literal_expr,
+        visitor.visit_unary_expr,
+        visitor.visit_variable_expr,
+    ]
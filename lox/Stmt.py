@@ -1,36 +1,48 @@
 from dataclasses import dataclass
-from typing import Any, Callable
+from typing import Any, Callable, ClassVar
 
 from lox.Expr import Expr
 from lox.token import Token
 
+EXPRESSION = 0
+PRINT = 1
+VAR = 2
 
-@dataclass
+
+@dataclass(slots=True)
 class Stmt:
+    kind: ClassVar[int] = -1
+
     def accept(self, visitor: "StmtVisitor")-> "Stmt":
         return Stmt()
 
 
-@dataclass
+@dataclass(slots=True)
 class Expression(Stmt):
+    kind: ClassVar[int] = EXPRESSION
     expression: Expr
+    line: int = 0
 
     def accept(self, visitor: "StmtVisitor") -> "Stmt":
         return visitor.visit_expression_stmt(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Print(Stmt):
+    kind: ClassVar[int] = PRINT
     expression: Expr
+    line: int = 0
 
     def accept(self, visitor: "StmtVisitor") -> "Stmt":
         return visitor.visit_print_stmt(self, visitor)
 
 
-@dataclass
+@dataclass(slots=True)
 class Var(Stmt):
+    kind: ClassVar[int] = VAR
     name: Token
     initializer: Expr | None
+    slot: int = -1
 
     def accept(self, visitor: "StmtVisitor") -> "Stmt":
         return visitor.visit_var_stmt(self, visitor)
@@ -42,3 +54,10 @@ class StmtVisitor:
     visit_print_stmt: Callable[[Print, "StmtVisitor"], Any]
     visit_var_stmt: Callable[[Var, "StmtVisitor"], Any]
 
+
+def stmt_dispatch_table(visitor: StmtVisitor) -> list[Callable[[Any, Any], Any]]:
+    return [
+        visitor.visit_expression_stmt,
+        visitor.visit_print_stmt,
+        visitor.visit_var_stmt,
+    ]
@@ -10,3 +10,11 @@ def error(token: Token, message: str):
     else:
         report(token.line, f"at '{token.lexeme}'", message)
 
+
+def __getattr__(name: str):
+    # Imported on first use, it loads every backend and asyncio, which
+    # importing lox.scanner alone should not pay for
+    if name == "Interpreter":
+        from lox.embed import Interpreter
+        return Interpreter
+    raise AttributeError(f"module 'lox' has no attribute '{name}'")
@@ -1,62 +1,422 @@
+import argparse
 import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable
 
 # from lox.ast_printer import ast_printer
 from lox.Stmt import Stmt
-from lox.error import HAD_ERROR, HAD_RUNTIME_ERROR
-from lox.interpreter import interpret
-from lox.parser import parse
-from lox.scanner import scan_tokens
+from lox.arena import build_arena, interpret_arena, to_statements
+from lox.cache import MIN_SIZE, CacheEntry, cache_key, load, store
+from lox.closures import interpret_closures
+from lox.compiler import compile_statements
+from lox.error import had_error, had_runtime_error, reset_error
+from lox.governor import Governor
+from lox.interpreter import Visitor, create_interpreter, interpret
+from lox.optimizer import create_optimizer, optimize, optimize_stream
+from lox.output import FLUSH_SIZE, StreamSink
+from lox.parser import parse, parse_stream
+from lox.scanner import (SCANNERS, bytes_tokens, decode_source, map_file,
+                         scan_token_stream, scan_tokens)
+from lox.state import current_state, flush_output
+from lox.token import Token
+from lox.token_buffer import TokenBuffer, scan_token_buffer
+from lox.vm import run_chunk, run_chunks
 
+BACKENDS = ("tree", "vm", "arena", "closure", "python")
 
-def main():
-    if len(sys.argv) > 2:
-        print("Usage: python -m lox <SCRIPT>")
+
+@dataclass
+class Options:
+    backend: str = "tree"
+    scanner: str = "regex"
+    stream: bool = False
+    mapped: bool = False
+    compact_tokens: bool = False
+    optimize: int = 0
+    cache: bool = True
+    mem_stats: bool = False
+    # Quotas of the tree interpreter, see Governor
+    max_nodes: int | None = None
+    timeout: float | None = None
+    max_string: int | None = None
+    max_variables: int | None = None
+
+
+class ArgumentParser(argparse.ArgumentParser):
+
+    def error(self, message: str):
+        self.print_usage(sys.stderr)
+        print(f"{self.prog}: error: {message}", file=sys.stderr)
         sys.exit(64)
-    elif len(sys.argv) == 2:
-        print(sys.argv)
-        run_file(sys.argv[1])
-        pass
+
+
+def main():
+    arg_parser = ArgumentParser(prog="python -m lox")
+    arg_parser.add_argument("script", nargs="?",
+                            help="script to run, '-' reads it from stdin")
+    arg_parser.add_argument("--backend", choices=BACKENDS, default="tree",
+                            help="execution engine (default: tree)")
+    arg_parser.add_argument("--scanner", choices=tuple(SCANNERS),
+                            default="regex",
+                            help="scanner engine (default: regex)")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="scan, parse and execute statement by "
+                            "statement instead of loading the whole script")
+    arg_parser.add_argument("--mmap", action="store_true", dest="mapped",
+                            help="memory-map the script and scan its raw "
+                            "bytes instead of reading it into a string")
+    arg_parser.add_argument("--compact-tokens", action="store_true",
+                            help="keep tokens as arrays of offsets into the "
+                            "source instead of Token objects")
+    arg_parser.add_argument("-O", action="count", default=0, dest="optimize",
+                            help="optimize, -O folds constants, -OO also "
+                            "simplifies algebraically")
+    arg_parser.add_argument("--no-cache", action="store_false", dest="cache",
+                            help="always scan and parse the script instead "
+                            "of using and writing __loxcache__")
+    arg_parser.add_argument("--max-nodes", type=int, metavar="N",
+                            help="stop the script after it evaluated N "
+                            "nodes (tree backend)")
+    arg_parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                            help="stop the script once it ran SECONDS "
+                            "(tree backend)")
+    arg_parser.add_argument("--max-string", type=int, metavar="N",
+                            help="fail concatenations giving strings longer "
+                            "than N characters (tree backend)")
+    arg_parser.add_argument("--max-variables", type=int, metavar="N",
+                            help="fail once the script defines more than N "
+                            "variables (tree backend)")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="count and time every node the tree "
+                            "interpreter evaluates, report on stderr")
+    arg_parser.add_argument("--profile-output", metavar="FILE",
+                            help="also write the profile, as pstats if FILE "
+                            "ends in .prof or .pstats, else as collapsed "
+                            "stacks for flamegraphs")
+    arg_parser.add_argument("--mem-stats", action="store_true",
+                            help="report the memory of scanning, parsing and "
+                            "interpreting the script on stderr, implies "
+                            "--no-cache")
+    arg_parser.add_argument("--flush-every", type=int, default=FLUSH_SIZE,
+                            metavar="CHARS",
+                            help="write the output once this much of it is "
+                            "waiting, and on errors and at exit (default: "
+                            f"{FLUSH_SIZE}, 0 writes every line)")
+    arg_parser.add_argument("--batch", metavar="DIR|GLOB",
+                            help="run every .lox file below DIR, or every "
+                            "file GLOB matches, in a pool of processes")
+    arg_parser.add_argument("--serve", metavar="SOCKET",
+                            help="stay resident and run the scripts "
+                            "tool/lox_client.py sends to the Unix SOCKET")
+    arg_parser.add_argument("--jobs", type=int,
+                            help="worker processes for --batch and --serve "
+                            "(default: one per CPU for --batch, 40 for "
+                            "--serve)")
+    arg_parser.add_argument("--summary", metavar="FILE",
+                            help="write the output, status and time of every "
+                            "--batch script as JSON")
+    args = arg_parser.parse_args()
+    if args.batch is not None and args.script is not None:
+        arg_parser.error("--batch takes no script")
+    if args.serve is not None and (args.script is not None
+                                   or args.batch is not None):
+        arg_parser.error("--serve takes no script and no --batch")
+    if args.mem_stats and (args.stream or args.script in (None, "-")):
+        arg_parser.error("--mem-stats needs a script file and no --stream")
+    if (args.profile or args.profile_output) and args.backend != "tree":
+        arg_parser.error("--profile needs --backend tree")
+    if args.backend != "tree" and any(
+            limit is not None for limit in (args.max_nodes, args.timeout,
+                                            args.max_string,
+                                            args.max_variables)):
+        arg_parser.error("--max-nodes, --timeout, --max-string and "
+                         "--max-variables need --backend tree")
+    options = Options(backend=args.backend, scanner=args.scanner,
+                      stream=args.stream, mapped=args.mapped,
+                      compact_tokens=args.compact_tokens,
+                      optimize=args.optimize, cache=args.cache,
+                      mem_stats=args.mem_stats, max_nodes=args.max_nodes,
+                      timeout=args.timeout, max_string=args.max_string,
+                      max_variables=args.max_variables)
+
+    if args.batch is not None:
+        if args.profile or args.profile_output:
+            arg_parser.error("--profile does not work with --batch")
+        sys.exit(batch(args.batch, options, args.jobs, args.summary))
+
+    if args.serve is not None:
+        if args.profile or args.profile_output:
+            arg_parser.error("--profile does not work with --serve")
+        from lox.server import serve
+        serve(args.serve, options, args.jobs)
+        return
+
+    # Without --profile the interpreter is created as usual, untouched
+    interpreter = None
+    profile = None
+    if args.profile or args.profile_output:
+        from lox.profiler import (Profile, instrument, print_report,
+                                  write_profile)
+        interpreter = create_interpreter(governor_of(options))
+        profile = Profile(script=args.script or "<prompt>")
+        instrument(interpreter, profile)
+    interpreter = governed(options, interpreter)
+
+    current_state().sink = StreamSink(flush_size=args.flush_every)
+    try:
+        if args.script == "-":
+            run_stream(scan_token_stream(sys.stdin), options, interpreter)
+            exit_on_error()
+        elif args.script is not None:
+            run_file(args.script, options, interpreter)
+        else:
+            run_prompt(options, interpreter)
+    finally:
+        flush_output()
+        if profile is not None:
+            print_report(profile)
+            if args.profile_output:
+                write_profile(profile, args.profile_output)
+
+
+def batch(pattern: str, options: Options, jobs: int | None = None,
+          summary: str | None = None) -> int:
+    # Modes are imported when used, running one script needs none of them
+    from lox.batch import (batch_status, find_scripts, print_summary,
+                           run_batch, write_summary)
+
+    paths = find_scripts(pattern)
+    start = time.perf_counter()
+    results = run_batch(paths, asdict(options), jobs)
+    seconds = time.perf_counter() - start
+
+    print_summary(results, seconds)
+    if summary:
+        write_summary(results, seconds, summary)
+    return batch_status(results)
+
+
+def run_file(path: str, options: Options = Options(),
+             interpreter: Visitor | None = None):
+    interpreter = governed(options, interpreter)
+    if options.mapped:
+        with open(path, "rb") as file, map_file(file) as data:
+            if options.stream:
+                run_stream(bytes_tokens(data), options, interpreter)
+            else:
+                run_script(path, data, options, interpreter)
+    elif options.stream:
+        with open(path, "r") as file:
+            run_stream(scan_token_stream(file), options, interpreter)
     else:
-        run_prompt()
-        pass
+        with open(path, "rb") as file:
+            run_script(path, file.read(), options, interpreter)
+
+    exit_on_error()
 
 
-def run_file(path: str):
-    global HAD_ERROR
-    global HAD_RUNTIME_ERROR
-    with open(path, "r") as file:
-        content = file.read()
+def run_script(path: str, data: bytes, options: Options = Options(),
+               interpreter: Visitor | None = None):
+    if options.mem_stats:
+        run_measured(data, options, interpreter)
+        return None
+    # Small scripts parse faster than their entry loads. What -O folds
+    # depends on the string quota, so those runs skip the cache too.
+    if not options.cache or len(data) < MIN_SIZE or (
+            options.optimize and options.max_string is not None):
+        run_tokens(scan_script(data, options), options, interpreter)
+        return None
+
+    # A cached program skips scanning and parsing, only hashing the source
+    key = cache_key(data, options.optimize)
+    entry = load(path, key, options.optimize)
+    statements = None
+    if entry is None:
+        statements = parse(scan_script(data, options))
+        if had_error():
+            return None
+        entry = CacheEntry(build_arena([]))
+        if options.optimize:
+            optimizer = create_optimizer(options.optimize,
+                                         governor_of(options))
+            statements = optimize(statements, optimizer)
+            entry.level = optimizer.level
+            entry.nodes_before = optimizer.nodes_before
+            entry.nodes_after = optimizer.nodes_after
+        build_arena(statements, entry.program)
+        store(path, key, entry, options.optimize)
+
+    if options.optimize:
+        report_optimizer(entry.level, entry.nodes_before, entry.nodes_after)
+    if options.backend == "arena":
+        interpret_arena(entry.program)
+    else:
+        execute(statements or to_statements(entry.program), options,
+                interpreter)
+
 
-    run(content)
+def run_measured(data: bytes, options: Options = Options(),
+                 interpreter: Visitor | None = None):
+    from lox.memstats import (MemStats, count_nodes, count_tokens,
+                              count_values, measure)
+    from lox.memstats import print_report as print_mem_stats
 
-    if HAD_ERROR:
+    stats = MemStats(len(data))
+    try:
+        with measure(stats, "scan") as phase:
+            tokens = scan_script(data, options)
+        count_tokens(tokens, phase.objects)
+
+        with measure(stats, "parse") as phase:
+            statements = parse(tokens)
+            if not had_error() and options.optimize:
+                optimizer = create_optimizer(options.optimize,
+                                             governor_of(options))
+                statements = optimize(statements, optimizer)
+                report_optimizer(optimizer.level, optimizer.nodes_before,
+                                 optimizer.nodes_after)
+        if had_error():
+            return None
+        count_nodes(statements, phase.objects)
+
+        if interpreter is None:
+            interpreter = create_interpreter()
+        with measure(stats, "interpret") as phase:
+            execute(statements, options, interpreter)
+        if options.backend in ("tree", "closure", "python"):
+            count_values(interpreter.environment.values, phase.objects)
+    finally:
+        # The report follows the output of the script
+        flush_output()
+        print_mem_stats(stats)
+
+
+def governor_of(options: Options) -> Governor | None:
+    governor = Governor(options.max_nodes, options.timeout,
+                        options.max_string, options.max_variables)
+    return governor if governor != Governor() else None
+
+
+def governed(options: Options, interpreter: Visitor | None) -> Visitor | None:
+    # Without quotas the interpreter is created where it always was
+    governor = governor_of(options)
+    if interpreter is None and governor is not None:
+        return create_interpreter(governor)
+    return interpreter
+
+
+def scan_script(data: bytes, options: Options) -> list[Token] | TokenBuffer:
+    if options.mapped:
+        return list(bytes_tokens(data))
+    return scan_source(decode_source(data), options)
+
+
+def exit_on_error():
+    if had_error():
         sys.exit(65)
-    if HAD_RUNTIME_ERROR:
+    if had_runtime_error():
         sys.exit(70)
-    
 
 
-def run_prompt():
-    global HAD_ERROR
+def run_prompt(options: Options = Options(),
+               interpreter: Visitor | None = None):
+    # One interpreter for the session, so variables outlive their line
+    if interpreter is None:
+        interpreter = create_interpreter(governor_of(options))
     while True:
         try:
             command = input(":>")
         except (EOFError, KeyboardInterrupt):
             print()
             break
-        run(command)
-        HAD_ERROR = False
+        run(command, options, interpreter)
+        flush_output()
+        reset_error()
+
+
+def run(source: str, options: Options = Options(),
+        interpreter: Visitor | None = None):
+    interpreter = governed(options, interpreter)
+    run_tokens(scan_source(source, options), options, interpreter)
 
 
-def run(source: str):
+def scan_source(source: str, options: Options) -> list[Token] | TokenBuffer:
+    if options.compact_tokens:
+        return scan_token_buffer(source)
+    return scan_tokens(source, options.scanner)
 
-    tokens = scan_tokens(source)
+
+def run_tokens(tokens: list[Token] | TokenBuffer, options: Options = Options(),
+               interpreter: Visitor | None = None):
     statements: list[Stmt] = parse(tokens)
 
-    if HAD_ERROR:
+    if had_error():
         return None
 
-    interpret(statements)
+    if options.optimize:
+        optimizer = create_optimizer(options.optimize, governor_of(options))
+        statements = optimize(statements, optimizer)
+        report_optimizer(optimizer.level, optimizer.nodes_before,
+                         optimizer.nodes_after)
+
+    execute(statements, options, interpreter)
+
+
+def execute(statements: list[Stmt], options: Options = Options(),
+            interpreter: Visitor | None = None):
+    if options.backend == "vm":
+        run_chunk(compile_statements(statements))
+    elif options.backend == "arena":
+        interpret_arena(build_arena(statements))
+    elif options.backend == "closure":
+        interpret_closures(statements, interpreter)
+    elif options.backend == "python":
+        from lox.transpiler import interpret_python
+        interpret_python(statements, interpreter)
+    else:
+        interpret(statements, interpreter)
+
+
+def run_stream(tokens: Iterable[Token], options: Options = Options(),
+               interpreter: Visitor | None = None):
+    statements = parse_stream(tokens)
+    if options.optimize:
+        optimizer = create_optimizer(options.optimize, governor_of(options))
+        statements = optimize_stream(statements, optimizer)
+
+    if options.backend == "arena":
+        # The arena holds the whole program compactly, so it can be built
+        # before running anything, like the non streaming path does.
+        arena = build_arena(statements)
+        if not had_error():
+            interpret_arena(arena)
+    else:
+        # Statements before a syntax error have already run by the time it is
+        # found, everything after it is still parsed for errors but not
+        # executed.
+        statements = (statement for statement in statements
+                      if not had_error())
+        if options.backend == "vm":
+            run_chunks(compile_statements([statement])
+                       for statement in statements)
+        elif options.backend == "closure":
+            interpret_closures(statements, interpreter)
+        elif options.backend == "python":
+            from lox.transpiler import interpret_python
+            # One statement per code object, so each runs once it is parsed
+            interpret_python(statements, interpreter, unit_size=1)
+        else:
+            interpret(statements, interpreter)
+
+    if options.optimize:
+        report_optimizer(optimizer.level, optimizer.nodes_before,
+                         optimizer.nodes_after)
+
+
+def report_optimizer(level: int, nodes_before: int, nodes_after: int):
+    print(f"[optimizer] -O{level} removed {nodes_before - nodes_after}"
+          f" of {nodes_before} nodes", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,406 @@
+import marshal
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from lox import Expr, Stmt
+from lox.Enviroment import Environment
+from lox.compiler import constant_key
+from lox.error import runtimeError
+from lox.state import write_line
+from lox.exceptions import RuntimeException
+from lox.interpreter import MAX_RECURSIVE_DEPTH, stringify
+from lox.operations import (BINARY_OPERATIONS, UNARY_OPERATIONS,
+                            check_number_operand, check_number_operands,
+                            is_equal, is_truthy)
+from lox.scanner import OPERATORS
+from lox.token import Token
+from lox.token_type import TokenType
+
+# Node kinds, expressions share the tags of lox.Expr, statements are moved
+# past them so both fit in one column.
+ASSIGN = Expr.ASSIGN
+BINARY = Expr.BINARY
+GROUPING = Expr.GROUPING
+LITERAL = Expr.LITERAL
+UNARY = Expr.UNARY
+VARIABLE = Expr.VARIABLE
+EXPRESSION = 8 + Stmt.EXPRESSION
+PRINT = 8 + Stmt.PRINT
+VAR = 8 + Stmt.VAR
+
+NO_NODE = -1
+
+FORMAT_VERSION = 2
+
+TOKEN_TYPES = list(TokenType)
+TOKEN_KINDS = {token_type: kind for kind, token_type in enumerate(TOKEN_TYPES)}
+LEXEMES = {token_type: lexeme for lexeme, token_type in OPERATORS.items()}
+
+
+@dataclass
+class Arena:
+    """A whole program as rows of typed columns.
+
+    Row i is one node: kinds[i] says what it is, lines[i] is the line of its
+    token and a/b/c hold its operands, either the row of a child node, an
+    index into constants or names, or the TokenType of an operator:
+
+        ASSIGN      a=name      b=value
+        BINARY      a=left      b=operator  c=right
+        GROUPING    a=expression
+        LITERAL     a=constant
+        UNARY       a=operator  b=right
+        VARIABLE    a=name
+        EXPRESSION  a=expression            c=depth
+        PRINT       a=expression            c=depth
+        VAR         a=name      b=initializer or NO_NODE  c=depth
+
+    c of a statement is how deep its expression nests, see execute_node.
+    statements lists the rows of the top level statements in order. Tokens are not kept, they are rebuilt from these columns when
+    needed.
+    """
+    kinds: array = field(default_factory=lambda: array("B"))
+    lines: array = field(default_factory=lambda: array("I"))
+    a: array = field(default_factory=lambda: array("i"))
+    b: array = field(default_factory=lambda: array("i"))
+    c: array = field(default_factory=lambda: array("i"))
+    statements: array = field(default_factory=lambda: array("i"))
+    constants: list = field(default_factory=list)
+    names: list[str] = field(default_factory=list)
+    constant_index: dict = field(default_factory=dict)
+    name_index: dict = field(default_factory=dict)
+
+    def add(self, kind: int, line: int, a: int = NO_NODE, b: int = NO_NODE,
+            c: int = NO_NODE) -> int:
+        self.kinds.append(kind)
+        self.lines.append(line)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        return len(self.kinds) - 1
+
+    def add_constant(self, value: object) -> int:
+        key = constant_key(value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def add_name(self, name: str) -> int:
+        index = self.name_index.get(name)
+        if index is None:
+            index = self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def name_token(self, index: int) -> Token:
+        return Token(TokenType.IDENTIFIER, self.names[self.a[index]], None,
+                     self.lines[index])
+
+    def operator_token(self, index: int, operand: array) -> Token:
+        token_type = TOKEN_TYPES[operand[index]]
+        return Token(token_type, LEXEMES.get(token_type, ""), None,
+                     self.lines[index])
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+
+def build_arena(statements: Iterable[Stmt.Stmt | None],
+                arena: Arena | None = None) -> Arena:
+    """Append statements to an arena.
+
+    Fed from lox.parser.parse_stream only one statement exists as objects
+    at a time, the program as a whole only ever lives in the arena.
+    """
+    if arena is None:
+        arena = Arena()
+    for statement in statements:
+        if statement is not None:
+            arena.statements.append(add_statement(arena, statement))
+    return arena
+
+
+def add_statement(arena: Arena, stmt: Stmt.Stmt) -> int:
+    match stmt:
+        case Stmt.Expression(expression):
+            row, depth = add_expression(arena, expression)
+            return arena.add(EXPRESSION, stmt.line, row, c=depth)
+        case Stmt.Print(expression):
+            row, depth = add_expression(arena, expression)
+            return arena.add(PRINT, stmt.line, row, c=depth)
+        case Stmt.Var(name, initializer):
+            row, depth = NO_NODE, 0
+            if initializer is not None:
+                row, depth = add_expression(arena, initializer)
+            return arena.add(VAR, name.line, arena.add_name(name.lexeme), row,
+                             depth)
+    raise TypeError(f"Unknown statement {stmt!r}")
+
+
+def add_expression(arena: Arena, expr: Expr.Expr) -> tuple[int, int]:
+    """Add the rows of expr, returns its row and how deep it nests."""
+    # Rows are added operands first, left to right. The nodes wait on an
+    # explicit stack, so expressions nest as deep as the parser allows.
+    rows: list[int] = []
+    pending: list[tuple[Expr.Expr, bool, int]] = [(expr, False, 1)]
+    max_depth = 0
+    while pending:
+        node, finish, depth = pending.pop()
+        if not finish:
+            if depth > max_depth:
+                max_depth = depth
+            match node:
+                case Expr.Literal(value):
+                    rows.append(arena.add(LITERAL, 0,
+                                          arena.add_constant(value)))
+                case Expr.Variable(name):
+                    rows.append(arena.add(VARIABLE, name.line,
+                                          arena.add_name(name.lexeme)))
+                case Expr.Binary(left, _, right):
+                    pending += ((node, True, depth), (right, False, depth + 1),
+                                (left, False, depth + 1))
+                case (Expr.Grouping(operand) | Expr.Unary(_, operand)
+                      | Expr.Assign(_, operand)):
+                    pending += ((node, True, depth), (operand, False, depth + 1))
+                case _:
+                    raise TypeError(f"Unknown expression {node!r}")
+            continue
+
+        match node:
+            case Expr.Binary(_, operator, _):
+                right_index = rows.pop()
+                left_index = rows.pop()
+                rows.append(arena.add(BINARY, operator.line, left_index,
+                                      TOKEN_KINDS[operator.token_type],
+                                      right_index))
+            case Expr.Grouping():
+                rows.append(arena.add(GROUPING, 0, rows.pop()))
+            case Expr.Unary(operator):
+                rows.append(arena.add(UNARY, operator.line,
+                                      TOKEN_KINDS[operator.token_type],
+                                      rows.pop()))
+            case Expr.Assign(name):
+                rows.append(arena.add(ASSIGN, name.line,
+                                      arena.add_name(name.lexeme), rows.pop()))
+    return rows.pop(), max_depth
+
+
+def to_statements(arena: Arena) -> list[Stmt.Stmt]:
+    """Rebuild the node objects of every statement, the inverse of build_arena."""
+    return [statement_at(arena, index) for index in arena.statements]
+
+
+def statement_at(arena: Arena, index: int) -> Stmt.Stmt:
+    kind = arena.kinds[index]
+    if kind == EXPRESSION:
+        return Stmt.Expression(expression_at(arena, arena.a[index]),
+                               arena.lines[index])
+    if kind == PRINT:
+        return Stmt.Print(expression_at(arena, arena.a[index]),
+                          arena.lines[index])
+    if kind == VAR:
+        initializer = None
+        if arena.b[index] != NO_NODE:
+            initializer = expression_at(arena, arena.b[index])
+        return Stmt.Var(arena.name_token(index), initializer)
+    raise ValueError(f"Row {index} is not a statement")
+
+
+def expression_at(arena: Arena, index: int) -> Expr.Expr:
+    # Explicit stacks like add_expression, operands are built first
+    nodes: list[Expr.Expr] = []
+    pending: list[tuple[int, bool]] = [(index, False)]
+    while pending:
+        row, finish = pending.pop()
+        kind = arena.kinds[row]
+        if kind == LITERAL:
+            nodes.append(Expr.Literal(arena.constants[arena.a[row]]))
+        elif kind == VARIABLE:
+            nodes.append(Expr.Variable(arena.name_token(row)))
+        elif not finish:
+            pending.append((row, True))
+            if kind == BINARY:
+                pending += ((arena.c[row], False), (arena.a[row], False))
+            elif kind == GROUPING:
+                pending.append((arena.a[row], False))
+            elif kind in (UNARY, ASSIGN):
+                pending.append((arena.b[row], False))
+            else:
+                raise ValueError(f"Row {row} is not an expression")
+        elif kind == BINARY:
+            right = nodes.pop()
+            operator = arena.operator_token(row, arena.b)
+            nodes.append(Expr.Binary(nodes.pop(), operator, right,
+                                     BINARY_OPERATIONS[operator.token_type]))
+        elif kind == GROUPING:
+            nodes.append(Expr.Grouping(nodes.pop()))
+        elif kind == UNARY:
+            operator = arena.operator_token(row, arena.a)
+            nodes.append(Expr.Unary(operator, nodes.pop(),
+                                    UNARY_OPERATIONS[operator.token_type]))
+        else:
+            nodes.append(Expr.Assign(arena.name_token(row), nodes.pop()))
+    return nodes.pop()
+
+
+def dumps(arena: Arena) -> bytes:
+    return marshal.dumps((
+        FORMAT_VERSION,
+        arena.kinds.tobytes(), arena.lines.tobytes(), arena.a.tobytes(),
+        arena.b.tobytes(), arena.c.tobytes(), arena.statements.tobytes(),
+        arena.constants, arena.names))
+
+
+def loads(data: bytes) -> Arena:
+    (version, kinds, lines, a, b, c, statements, constants,
+     names) = marshal.loads(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported arena format {version}")
+
+    arena = Arena(constants=constants, names=names,
+                  constant_index={constant_key(value): index
+                                  for index, value in enumerate(constants)},
+                  name_index={name: index for index, name in enumerate(names)})
+    arena.kinds.frombytes(kinds)
+    arena.lines.frombytes(lines)
+    arena.a.frombytes(a)
+    arena.b.frombytes(b)
+    arena.c.frombytes(c)
+    arena.statements.frombytes(statements)
+    return arena
+
+
+def interpret_arena(arena: Arena, environment: Environment | None = None):
+    if environment is None:
+        environment = Environment()
+    try:
+        for statement in arena.statements:
+            execute_node(arena, statement, environment)
+    except RuntimeException as error:
+        runtimeError(error)
+
+
+def execute_node(arena: Arena, index: int, environment: Environment):
+    kind = arena.kinds[index]
+    evaluate = evaluate_node
+    if arena.c[index] > MAX_RECURSIVE_DEPTH:
+        evaluate = evaluate_iterative
+    if kind == EXPRESSION:
+        evaluate(arena, arena.a[index], environment)
+    elif kind == PRINT:
+        write_line(stringify(evaluate(arena, arena.a[index], environment)))
+    elif kind == VAR:
+        value = None
+        if arena.b[index] != NO_NODE:
+            value = evaluate(arena, arena.b[index], environment)
+        environment.define(arena.names[arena.a[index]], value)
+
+
+def evaluate_node(arena: Arena, index: int, environment: Environment):
+    kind = arena.kinds[index]
+
+    if kind == BINARY:
+        left = evaluate_node(arena, arena.a[index], environment)
+        right = evaluate_node(arena, arena.c[index], environment)
+        return binary(arena, index, left, right)
+    if kind == LITERAL:
+        return arena.constants[arena.a[index]]
+    if kind == VARIABLE:
+        return environment.get(arena.name_token(index))
+    if kind == GROUPING:
+        return evaluate_node(arena, arena.a[index], environment)
+    if kind == UNARY:
+        return unary(arena, index,
+                     evaluate_node(arena, arena.b[index], environment))
+    if kind == ASSIGN:
+        value = evaluate_node(arena, arena.b[index], environment)
+        environment.assign(arena.name_token(index), value)
+        return value
+
+    # Unreachable
+    return None
+
+
+def evaluate_iterative(arena: Arena, index: int, environment: Environment):
+    """Evaluate like evaluate_node, with explicit stacks instead of recursion.
+
+    Slower per node, it is used for statements nesting too deep to recurse
+    through, see execute_node.
+    """
+    kinds = arena.kinds
+    values: list = []
+    # Rows to evaluate, or to finish once their operands are on values
+    pending: list[tuple[int, bool]] = [(index, False)]
+    while pending:
+        row, finish = pending.pop()
+        kind = kinds[row]
+        if kind == LITERAL:
+            values.append(arena.constants[arena.a[row]])
+        elif kind == VARIABLE:
+            values.append(environment.get(arena.name_token(row)))
+        elif not finish:
+            pending.append((row, True))
+            if kind == BINARY:
+                pending += ((arena.c[row], False), (arena.a[row], False))
+            elif kind == GROUPING:
+                pending.append((arena.a[row], False))
+            else:
+                pending.append((arena.b[row], False))
+        elif kind == BINARY:
+            right = values.pop()
+            values.append(binary(arena, row, values.pop(), right))
+        elif kind == UNARY:
+            values.append(unary(arena, row, values.pop()))
+        elif kind == ASSIGN:
+            environment.assign(arena.name_token(row), values[-1])
+        # A grouping has the value of its expression
+    return values.pop()
+
+
+def unary(arena: Arena, index: int, right: object):
+    if TOKEN_TYPES[arena.a[index]] == TokenType.BANG:
+        return not is_truthy(right)
+    if not isinstance(right, float):
+        check_number_operand(arena.operator_token(index, arena.a), right)
+    return -right  # type: ignore
+
+
+def binary(arena: Arena, index: int, left: object, right: object):
+    token_type = TOKEN_TYPES[arena.b[index]]
+
+    if token_type == TokenType.EQUAL_EQUAL:
+        return is_equal(left, right)
+    if token_type == TokenType.BANG_EQUAL:
+        return not is_equal(left, right)
+    if token_type == TokenType.PLUS:
+        if isinstance(left, float) and isinstance(right, float):
+            return left + right
+        if isinstance(left, str) and isinstance(right, str):
+            return left + right
+        return None
+
+    if not (isinstance(left, float) and isinstance(right, float)):
+        check_number_operands(arena.operator_token(index, arena.b), left,
+                              right)
+
+    match token_type:
+        case TokenType.GREATER:
+            return left > right  # type: ignore
+        case TokenType.GREATER_EQUAL:
+            return left >= right  # type: ignore
+        case TokenType.LESS:
+            return left < right  # type: ignore
+        case TokenType.LESS_EQUAL:
+            return left <= right  # type: ignore
+        case TokenType.MINUS:
+            return left - right  # type: ignore
+        case TokenType.SLASH:
+            return left / right  # type: ignore
+        case TokenType.STAR:
+            return left * right  # type: ignore
+
+    # Unreachable
+    return None
@@ -1,37 +1,67 @@
+from dataclasses import dataclass, field
+
 from lox import Expr
 
+
+@dataclass
+class AstPrinter(Expr.ExprVisitor):
+    # Text and nodes still to print, last pushed first, instead of the call
+    # stack, so nesting is only bounded by memory
+    pending: list[str | Expr.Expr] = field(default_factory=list)
+
+
 def ast_printer(expression: Expr.Expr):
 
-    printer = Expr.Visitor(visit_binary_expr=visit_binary_expr,
-                           visit_grouping_expr=visit_grouping_expr,
-                           visit_literal_expr=visit_literal_expr,
-                           visit_unary_expr=visit_unary_expr)
-    return expression.accept(printer)
+    printer = AstPrinter(visit_assign_expr=visit_assign_expr,
+                         visit_binary_expr=visit_binary_expr,
+                         visit_grouping_expr=visit_grouping_expr,
+                         visit_literal_expr=visit_literal_expr,
+                         visit_unary_expr=visit_unary_expr,
+                         visit_variable_expr=visit_variable_expr)
+    string = []
+    pending = printer.pending
+    pending.append(expression)
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            string.append(item)
+        else:
+            item.accept(printer)
+    return "".join(string)
 
 
-def visit_binary_expr(expr: Expr.Binary, visitor: Expr.Visitor):
-    return parenthesize(visitor, expr.operator.lexeme, expr.left, expr.right)
+def visit_assign_expr(expr: Expr.Assign, printer: AstPrinter):
+    parenthesize(printer, f"= {expr.name.lexeme}", expr.value)
 
 
-def visit_grouping_expr(expr: Expr.Grouping, visitor: Expr.Visitor):
-    return parenthesize(visitor, "group", expr.expression)
+def visit_binary_expr(expr: Expr.Binary, printer: AstPrinter):
+    parenthesize(printer, expr.operator.lexeme, expr.left, expr.right)
 
 
-def visit_literal_expr(expr: Expr.Literal, visitor: Expr.Visitor):
+def visit_grouping_expr(expr: Expr.Grouping, printer: AstPrinter):
+    parenthesize(printer, "group", expr.expression)
+
+
+def visit_literal_expr(expr: Expr.Literal, printer: AstPrinter):
     if expr.value is None:
-        return "nil"
-    return str(expr.value)
+        printer.pending.append("nil")
+    else:
+        printer.pending.append(str(expr.value))
+
 
+def visit_unary_expr(expr: Expr.Unary, printer: AstPrinter):
+    parenthesize(printer, expr.operator.lexeme, expr.right)
 
-def visit_unary_expr(expr: Expr.Unary, visitor: Expr.Visitor):
-    return parenthesize(visitor, expr.operator.lexeme, expr.right)
 
+def visit_variable_expr(expr: Expr.Variable, printer: AstPrinter):
+    printer.pending.append(expr.name.lexeme)
 
-def parenthesize(visitor: Expr.Visitor, name: str, *exprs: Expr.Expr):
-    string = ""
-    string += f"({name}"
-    for expr in exprs:
-        string += f" {expr.accept(visitor)}"
-    string += ")"
 
-    return string
+def parenthesize(printer: AstPrinter, name: str, *exprs: Expr.Expr):
+    # Pushed in reverse, the name comes out first
+    pending = printer.pending
+    pending.append(")")
+    for expr in reversed(exprs):
+        pending.append(expr)
+        pending.append(" ")
+    pending.append(f"({name}")
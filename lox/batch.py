@@ -0,0 +1,96 @@
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TextIO
+
+from lox.state import RunState, flush_output, use_state
+
+
+@dataclass
+class ScriptResult:
+    path: str
+    status: int
+    seconds: float
+    stdout: str
+    stderr: str
+
+
+def find_scripts(pattern: str) -> list[str]:
+    """Every .lox file below a directory, or the files a glob matches."""
+    if os.path.isdir(pattern):
+        return sorted(str(path) for path in Path(pattern).rglob("*.lox"))
+    return sorted(path for path in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(path))
+
+
+def warm_up():
+    # Runs once per worker, scripts then start with everything imported
+    import lox.__main__  # noqa: F401
+
+
+def run_script_file(path: str, options: dict) -> ScriptResult:
+    """Run one script like python -m lox would, capturing what it prints."""
+    from lox.__main__ import Options, run_file
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    start = time.perf_counter()
+    with (use_state(RunState(output=stdout)),
+          contextlib.redirect_stdout(stdout),
+          contextlib.redirect_stderr(stderr)):
+        try:
+            run_file(path, Options(**options))
+        except SystemExit as exit:
+            status = exit.code if isinstance(exit.code, int) else 1
+        except Exception as error:
+            # A crash of the interpreter itself, python would exit with 1
+            print(f"{type(error).__name__}: {error}", file=stderr)
+            status = 1
+        finally:
+            flush_output()
+    return ScriptResult(path, status, time.perf_counter() - start,
+                        stdout.getvalue(), stderr.getvalue())
+
+
+def run_batch(paths: list[str], options: dict,
+              jobs: int | None = None) -> list[ScriptResult]:
+    if not paths:
+        return []
+    jobs = jobs or os.cpu_count() or 1
+    # Scripts are usually short, hand them out a few at a time
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_up) as pool:
+        return list(pool.map(run_script_file, paths,
+                             [options] * len(paths), chunksize=chunksize))
+
+
+def print_summary(results: list[ScriptResult], seconds: float,
+                  file: TextIO = sys.stdout):
+    for result in results:
+        print(f"{result.status:>3} {result.seconds:9.4f} s  {result.path}",
+              file=file)
+    failed = sum(1 for result in results if result.status != 0)
+    script_seconds = sum(result.seconds for result in results)
+    print(f"{len(results)} scripts, {len(results) - failed} passed, "
+          f"{failed} failed, {seconds:.3f} s wall, "
+          f"{script_seconds:.3f} s in scripts", file=file)
+
+
+def write_summary(results: list[ScriptResult], seconds: float, path: str):
+    with open(path, "w") as file:
+        json.dump({"seconds": seconds,
+                   "scripts": [asdict(result) for result in results]},
+                  file, indent=2)
+
+
+def batch_status(results: list[ScriptResult]) -> int:
+    # The highest status of any script, 0 when all of them succeeded
+    return max((result.status for result in results), default=0)
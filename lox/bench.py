@@ -0,0 +1,241 @@
+"""Time the scanner, the parser and the interpreter separately.
+
+Runs every case of the corpus in benchmarks/corpus and a few synthetic ones,
+reports throughput and peak memory per phase, and can save the results as
+JSON and compare them against an earlier run.
+
+    python -m lox.bench [--scale 1] [--repeat 3] [--case NAME ...]
+                        [--output results.json]
+                        [--compare baseline.json] [--threshold 0.1]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from lox.Stmt import Stmt
+from lox.error import had_error
+from lox.interpreter import interpret
+from lox.optimizer import count_nodes
+from lox.output import MemorySink
+from lox.parser import parse
+from lox.scanner import scan_tokens
+from lox.state import RunState, use_state
+
+ROOT = Path(__file__).resolve().parent.parent
+CORPUS = ROOT / "benchmarks" / "corpus"
+
+# Copies of a corpus file per unit of scale, they are too small on their own
+CORPUS_COPIES = 200
+
+PHASES = ("scan", "parse", "interpret")
+UNITS = {"scan": "tokens", "parse": "nodes", "interpret": "statements"}
+
+
+def arithmetic_chains(scale: int) -> str:
+    chain = " + ".join(f"a * {n} - b / {n + 1}" for n in range(1, 26))
+    lines = ["var a = 1;", "var b = 2;"]
+    lines += [f"a = {chain};"] * (500 * scale)
+    return "\n".join(lines)
+
+
+def declarations(scale: int) -> str:
+    return "\n".join(f"var v{n} = {n} * 2 + 1;" for n in range(20000 * scale))
+
+
+def deep_nesting(scale: int) -> str:
+    # Nested past MAX_RECURSIVE_DEPTH, so this times the paths without
+    # recursion. Deeper with scale rather than longer, the size stays linear.
+    depth = 1000 * scale
+    expression = "(" * depth + "1" + " + 1)" * depth
+    return "\n".join(f"print {expression};" for _ in range(50))
+
+
+def large_strings(scale: int) -> str:
+    text = "lox " * 2500
+    lines = ['var s = "";']
+    for n in range(200 * scale):
+        lines.append(f'var s{n} = "{text}";')
+        lines.append(f"s = s{n} + s{n};")
+    return "\n".join(lines)
+
+
+SYNTHETIC: dict[str, Callable[[int], str]] = {
+    "arithmetic-chains": arithmetic_chains,
+    "declarations": declarations,
+    "deep-nesting": deep_nesting,
+    "large-strings": large_strings,
+}
+
+
+def corpus_cases(scale: int) -> dict[str, Callable[[], str]]:
+    paths = [ROOT / "test.lox", *sorted(CORPUS.glob("*.lox"))]
+    cases = {}
+    for path in paths:
+        if path.exists():
+            cases[path.stem] = (lambda path=path: "\n".join(
+                [path.read_text()] * (CORPUS_COPIES * scale)))
+    return cases
+
+
+def all_cases(scale: int) -> dict[str, Callable[[], str]]:
+    cases = corpus_cases(scale)
+    for name, generate in SYNTHETIC.items():
+        cases[name] = lambda generate=generate: generate(scale)
+    return cases
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(function: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def interpret_quietly(statements: list[Stmt]) -> Callable[[], object]:
+    def run():
+        # A state per run, printing into memory is part of the timed cost
+        # and the lines go away with the state
+        state = RunState(sink=MemorySink())
+        with use_state(state):
+            interpret(statements)
+        if state.had_runtime_error:
+            raise ValueError("benchmark source fails at runtime")
+    return run
+
+
+def measure(source: str, repeat: int) -> dict:
+    tokens = scan_tokens(source)
+    statements = parse(tokens)
+    if had_error():
+        raise ValueError("benchmark source does not parse")
+
+    counts = {
+        "tokens": len(tokens),
+        "nodes": sum(count_nodes(statement) for statement in statements),
+        "statements": len(statements),
+    }
+    functions = {
+        "scan": lambda: scan_tokens(source),
+        "parse": lambda: parse(tokens),
+        "interpret": interpret_quietly(statements),
+    }
+
+    phases = {}
+    for phase, function in functions.items():
+        seconds = best_time(function, repeat)
+        phases[phase] = {
+            "seconds": seconds,
+            "per_second": counts[UNITS[phase]] / seconds,
+            "peak_bytes": peak_memory(function),
+        }
+
+    return {"source_bytes": len(source.encode()), **counts, "phases": phases}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for case, result in results["cases"].items():
+        old = baseline["cases"].get(case)
+        if old is None:
+            continue
+        for phase in PHASES:
+            before = old["phases"][phase]["seconds"]
+            after = result["phases"][phase]["seconds"]
+            if after > before * (1 + threshold):
+                regressions.append(
+                    f"{case} {phase}: {before:.4f} s -> {after:.4f} s "
+                    f"(+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(case: str, result: dict):
+    print(f"{case}: {result['source_bytes'] / 1024:,.0f} KB, "
+          f"{result['tokens']:,} tokens, {result['nodes']:,} nodes, "
+          f"{result['statements']:,} statements")
+    for phase in PHASES:
+        numbers = result["phases"][phase]
+        print(f"  {phase:<10} {numbers['seconds']:8.4f} s "
+              f"{numbers['per_second']:>14,.0f} {UNITS[phase]}/s "
+              f"{numbers['peak_bytes'] / 1024 / 1024:8.1f} MB peak")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="python -m lox.bench")
+    arg_parser.add_argument("--scale", type=int, default=1,
+                            help="multiply the size of every case")
+    arg_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs per phase, the fastest one counts")
+    arg_parser.add_argument("--case", action="append", dest="cases",
+                            help="only run this case, can be repeated")
+    arg_parser.add_argument("--output", help="write the results as JSON")
+    arg_parser.add_argument("--compare", metavar="BASELINE",
+                            help="JSON results of an earlier run")
+    arg_parser.add_argument("--threshold", type=float, default=0.1,
+                            help="slowdown that counts as a regression "
+                            "(default: 0.1, 10%%)")
+    args = arg_parser.parse_args()
+
+    cases = all_cases(args.scale)
+    if args.cases:
+        unknown = set(args.cases) - set(cases)
+        if unknown:
+            arg_parser.error(f"unknown case {', '.join(sorted(unknown))}, "
+                             f"choose from {', '.join(cases)}")
+        cases = {name: cases[name] for name in args.cases}
+
+    results = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "cases": {},
+    }
+    for name, generate in cases.items():
+        results["cases"][name] = measure(generate(), args.repeat)
+        print_result(name, results["cases"][name])
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        print(f"compared with {baseline.get('revision') or args.compare}: "
+              f"{len(regressions)} regression(s)")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
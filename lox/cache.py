@@ -0,0 +1,105 @@
+import hashlib
+import locale
+import marshal
+import os
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+from lox import (Expr, Stmt, arena, operations, optimizer, parser, scanner,
+                 token_type)
+from lox.arena import Arena
+
+CACHE_DIR = "__loxcache__"
+SUFFIX = ".loxc"
+MAGIC = b"LOXC"
+# Below this many bytes scanning and parsing is faster than hashing the
+# source and loading its entry, about 0.5 ms either way at 700 bytes
+MIN_SIZE = 1 << 10
+
+
+@cache
+def interpreter_version() -> bytes:
+    """Hash of the code that decides what a script compiles to.
+
+    Any change to the scanner, the parser, the optimizer, the operations
+    the nodes carry, the token types or the arena format gives a new
+    version, so entries written by an older interpreter never match. Arena
+    rows keep token types by their position in TokenType.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(arena.FORMAT_VERSION.to_bytes(4, "little"))
+    for module in (scanner, parser, optimizer, arena, operations, token_type,
+                   Expr, Stmt):
+        digest.update(Path(module.__file__).read_bytes())  # type: ignore
+    return digest.digest()
+
+
+@dataclass
+class CacheEntry:
+    """A parsed, and maybe optimized, program and the optimizer's report."""
+    program: Arena
+    level: int = 0
+    nodes_before: int = 0
+    nodes_after: int = 0
+
+
+def cache_path(script: str, optimize: int = 0) -> Path:
+    # Like .opt-1.pyc, so runs at different levels do not evict each other
+    path = Path(script)
+    name = path.name + (f".opt-{optimize}" if optimize else "") + SUFFIX
+    return path.parent / CACHE_DIR / name
+
+
+def cache_key(source: bytes, optimize: int) -> bytes:
+    digest = hashlib.blake2b(source, digest_size=16)
+    digest.update(interpreter_version())
+    digest.update(optimize.to_bytes(1, "little"))
+    # The source is decoded with the locale's encoding
+    digest.update(locale.getpreferredencoding(False).encode())
+    return digest.digest()
+
+
+def load(script: str, key: bytes, optimize: int = 0) -> CacheEntry | None:
+    try:
+        data = cache_path(script, optimize).read_bytes()
+    except OSError:
+        return None
+    if not data.startswith(MAGIC):
+        return None
+
+    try:
+        (entry_key, level, nodes_before, nodes_after,
+         program) = marshal.loads(data[len(MAGIC):])
+        if entry_key != key:
+            # Stale, the script or the interpreter changed since
+            return None
+        return CacheEntry(arena.loads(program), level, nodes_before,
+                          nodes_after)
+    except (EOFError, ValueError, TypeError):
+        # Truncated or from an unknown format, treat it as missing
+        return None
+
+
+def store(script: str, key: bytes, entry: CacheEntry, optimize: int = 0):
+    data = MAGIC + marshal.dumps((key, entry.level, entry.nodes_before,
+                                  entry.nodes_after, arena.dumps(entry.program)))
+    path = cache_path(script, optimize)
+    try:
+        path.parent.mkdir(exist_ok=True)
+        # Written next to the entry and renamed over it, so a concurrent
+        # run sees either the old entry or the new one, never a partial one.
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                             0o666)
+        try:
+            with open(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except OSError:
+        # Like __pycache__, an unwritable cache only costs speed
+        pass
+
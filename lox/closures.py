@@ -0,0 +1,356 @@
+from typing import Callable, Iterable
+
+from lox.Enviroment import UNDEFINED
+from lox.Expr import Assign, Binary, Expr, Grouping, Literal, Unary, Variable
+from lox.Stmt import Expression, Print, Stmt, Var
+from lox.error import runtimeError
+from lox.exceptions import RuntimeException
+from lox.interpreter import (MAX_RECURSIVE_DEPTH, Visitor, create_interpreter,
+                             execute, iterative_visitor, stringify)
+from lox.operations import is_equal, is_truthy
+from lox.resolver import resolve_stmt
+from lox.state import write_line
+from lox.token import Token
+from lox.token_type import TokenType
+
+# Every node is compiled once into a closure that takes no arguments. The
+# closures read variables straight from the environment's list of slots,
+# which only ever grows in place, so they can hold on to it.
+Closure = Callable[[], object]
+
+
+def interpret_closures(statements: Iterable[Stmt],
+                       interpreter: Visitor | None = None):
+    if interpreter is None:
+        interpreter = create_interpreter()
+    resolver = interpreter.resolver
+    environment = interpreter.environment
+    try:
+        for statement in statements:
+            resolve_stmt(statement, resolver)
+            environment.reserve(resolver.slot_count)
+            if resolver.max_depth > MAX_RECURSIVE_DEPTH:
+                # Compiling and calling the closures both recurse per level,
+                # evaluate the statement without recursion instead
+                execute(statement, iterative_visitor(interpreter))
+            else:
+                compile_stmt(statement, environment.values)()
+    except RuntimeException as error:
+        runtimeError(error)
+
+
+def compile_stmt(stmt: Stmt, values: list) -> Closure:
+    return STMT_COMPILERS[stmt.kind](stmt, values)
+
+
+def compile_expr(expr: Expr, values: list) -> Closure:
+    return EXPR_COMPILERS[expr.kind](expr, values)
+
+
+def compile_expression_stmt(stmt: Expression, values: list) -> Closure:
+    return compile_expr(stmt.expression, values)
+
+
+def compile_print_stmt(stmt: Print, values: list) -> Closure:
+    expression = compile_expr(stmt.expression, values)
+
+    def print_stmt():
+        write_line(stringify(expression()))
+    return print_stmt
+
+
+def compile_var_stmt(stmt: Var, values: list) -> Closure:
+    slot = stmt.slot
+    if stmt.initializer is None:
+        def declare():
+            values[slot] = None
+        return declare
+
+    initializer = compile_expr(stmt.initializer, values)
+
+    def define():
+        values[slot] = initializer()
+    return define
+
+
+def compile_literal_expr(expr: Literal, _: list) -> Closure:
+    value = expr.value
+    return lambda: value
+
+
+def compile_grouping_expr(expr: Grouping, values: list) -> Closure:
+    return compile_expr(expr.expression, values)
+
+
+def compile_variable_expr(expr: Variable, values: list) -> Closure:
+    return compile_variable(expr.name, expr.slot, values)
+
+
+def compile_assign_expr(expr: Assign, values: list) -> Closure:
+    return compile_assign(expr.name, compile_expr(expr.value, values),
+                          expr.slot, values)
+
+
+def compile_unary_expr(expr: Unary, values: list) -> Closure:
+    return compile_unary(expr.operator, compile_expr(expr.right, values))
+
+
+def compile_binary_expr(expr: Binary, values: list) -> Closure:
+    return compile_binary(expr.left, expr.operator, expr.right, values)
+
+
+def compile_variable(name: Token, slot: int, values: list) -> Closure:
+    def variable():
+        value = values[slot]
+        if value is UNDEFINED:
+            raise RuntimeException(name, f"Undefined variable {name.lexeme}.")
+        return value
+    return variable
+
+
+def compile_assign(name: Token, value: Closure, slot: int,
+                   values: list) -> Closure:
+    def assign():
+        result = value()
+        if values[slot] is UNDEFINED:
+            raise RuntimeException(name, f"Undefined variable {name.lexeme}.")
+        values[slot] = result
+        return result
+    return assign
+
+
+def compile_unary(operator: Token, right: Closure) -> Closure:
+    if operator.token_type == TokenType.BANG:
+        def bang():
+            return not is_truthy(right())
+        return bang
+
+    def negate():
+        value = right()
+        if type(value) is not float:
+            raise RuntimeException(operator, "Must be a number")
+        return -value
+    return negate
+
+
+def compile_binary(left_expr: Expr, operator: Token, right_expr: Expr,
+                   values: list) -> Closure:
+    token_type = operator.token_type
+    left = compile_expr(left_expr, values)
+    right = compile_expr(right_expr, values)
+
+    if token_type == TokenType.EQUAL_EQUAL:
+        return lambda: is_equal(left(), right())
+    if token_type == TokenType.BANG_EQUAL:
+        return lambda: not is_equal(left(), right())
+    if token_type == TokenType.PLUS:
+        return compile_plus(left, right)
+
+    # A number literal on the right needs neither a call nor a type check
+    constant = number_literal(right_expr)
+    if constant is not None:
+        return NUMBER_CONSTANT_OPERATORS[token_type](operator, left, constant)
+    return NUMBER_OPERATORS[token_type](operator, left, right)
+
+
+def number_literal(expr: Expr) -> float | None:
+    while isinstance(expr, Grouping):
+        expr = expr.expression
+    if isinstance(expr, Literal) and type(expr.value) is float:
+        return expr.value
+    return None
+
+
+def compile_plus(left: Closure, right: Closure) -> Closure:
+    def plus():
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float:
+            return a + b
+        if type(a) is str and type(b) is str:
+            return a + b
+        # Matches the tree walker, mixed operands evaluate to nil
+        return None
+    return plus
+
+
+def operands_error(operator: Token) -> RuntimeException:
+    return RuntimeException(operator, "Operands must be a numbers")
+
+
+def compile_minus(operator: Token, left: Closure, right: Closure) -> Closure:
+    def minus():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a - b
+    return minus
+
+
+def compile_star(operator: Token, left: Closure, right: Closure) -> Closure:
+    def star():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a * b
+    return star
+
+
+def compile_slash(operator: Token, left: Closure, right: Closure) -> Closure:
+    def slash():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a / b
+    return slash
+
+
+def compile_greater(operator: Token, left: Closure, right: Closure) -> Closure:
+    def greater():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a > b
+    return greater
+
+
+def compile_greater_equal(operator: Token, left: Closure,
+                          right: Closure) -> Closure:
+    def greater_equal():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a >= b
+    return greater_equal
+
+
+def compile_less(operator: Token, left: Closure, right: Closure) -> Closure:
+    def less():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a < b
+    return less
+
+
+def compile_less_equal(operator: Token, left: Closure,
+                       right: Closure) -> Closure:
+    def less_equal():
+        a = left()
+        b = right()
+        if type(a) is not float or type(b) is not float:
+            raise operands_error(operator)
+        return a <= b
+    return less_equal
+
+
+def compile_minus_constant(operator: Token, left: Closure,
+                           b: float) -> Closure:
+    def minus():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a - b
+    return minus
+
+
+def compile_star_constant(operator: Token, left: Closure, b: float) -> Closure:
+    def star():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a * b
+    return star
+
+
+def compile_slash_constant(operator: Token, left: Closure,
+                           b: float) -> Closure:
+    def slash():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a / b
+    return slash
+
+
+def compile_greater_constant(operator: Token, left: Closure,
+                             b: float) -> Closure:
+    def greater():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a > b
+    return greater
+
+
+def compile_greater_equal_constant(operator: Token, left: Closure,
+                                   b: float) -> Closure:
+    def greater_equal():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a >= b
+    return greater_equal
+
+
+def compile_less_constant(operator: Token, left: Closure,
+                          b: float) -> Closure:
+    def less():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a < b
+    return less
+
+
+def compile_less_equal_constant(operator: Token, left: Closure,
+                                b: float) -> Closure:
+    def less_equal():
+        a = left()
+        if type(a) is not float:
+            raise operands_error(operator)
+        return a <= b
+    return less_equal
+
+
+NUMBER_OPERATORS = {
+    TokenType.MINUS: compile_minus,
+    TokenType.STAR: compile_star,
+    TokenType.SLASH: compile_slash,
+    TokenType.GREATER: compile_greater,
+    TokenType.GREATER_EQUAL: compile_greater_equal,
+    TokenType.LESS: compile_less,
+    TokenType.LESS_EQUAL: compile_less_equal,
+}
+
+NUMBER_CONSTANT_OPERATORS = {
+    TokenType.MINUS: compile_minus_constant,
+    TokenType.STAR: compile_star_constant,
+    TokenType.SLASH: compile_slash_constant,
+    TokenType.GREATER: compile_greater_constant,
+    TokenType.GREATER_EQUAL: compile_greater_equal_constant,
+    TokenType.LESS: compile_less_constant,
+    TokenType.LESS_EQUAL: compile_less_equal_constant,
+}
+
+# Indexed by the kind tags of lox.Expr and lox.Stmt
+EXPR_COMPILERS = [
+    compile_assign_expr,
+    compile_binary_expr,
+    compile_grouping_expr,
+    compile_literal_expr,
+    compile_unary_expr,
+    compile_variable_expr,
+]
+
+STMT_COMPILERS = [
+    compile_expression_stmt,
+    compile_print_stmt,
+    compile_var_stmt,
+]
@@ -0,0 +1,222 @@
+import math
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from lox.Expr import (Assign, Binary, Expr, ExprVisitor, Grouping, Literal,
+                      Unary, Variable, expr_dispatch_table)
+from lox.Stmt import (Expression, Print, Stmt, StmtVisitor, Var,
+                      stmt_dispatch_table)
+from lox.token_type import TokenType
+
+# Opcodes, every instruction is one slot in Chunk.code, followed by one
+# operand slot for the instructions that take a constant index.
+OP_CONSTANT = 0
+OP_NIL = 1
+OP_TRUE = 2
+OP_FALSE = 3
+OP_POP = 4
+OP_GET_GLOBAL = 5
+OP_DEFINE_GLOBAL = 6
+OP_SET_GLOBAL = 7
+OP_EQUAL = 8
+OP_NOT_EQUAL = 9
+OP_GREATER = 10
+OP_GREATER_EQUAL = 11
+OP_LESS = 12
+OP_LESS_EQUAL = 13
+OP_ADD = 14
+OP_SUBTRACT = 15
+OP_MULTIPLY = 16
+OP_DIVIDE = 17
+OP_NOT = 18
+OP_NEGATE = 19
+OP_PRINT = 20
+OP_RETURN = 21
+
+BINARY_OPCODES = {
+    TokenType.EQUAL_EQUAL: OP_EQUAL,
+    TokenType.BANG_EQUAL: OP_NOT_EQUAL,
+    TokenType.GREATER: OP_GREATER,
+    TokenType.GREATER_EQUAL: OP_GREATER_EQUAL,
+    TokenType.LESS: OP_LESS,
+    TokenType.LESS_EQUAL: OP_LESS_EQUAL,
+    TokenType.PLUS: OP_ADD,
+    TokenType.MINUS: OP_SUBTRACT,
+    TokenType.STAR: OP_MULTIPLY,
+    TokenType.SLASH: OP_DIVIDE,
+}
+
+UNARY_OPCODES = {
+    TokenType.BANG: OP_NOT,
+    TokenType.MINUS: OP_NEGATE,
+}
+
+
+@dataclass
+class Chunk:
+    code: array = field(default_factory=lambda: array("I"))
+    lines: array = field(default_factory=lambda: array("I"))
+    constants: list = field(default_factory=list)
+    constant_index: dict = field(default_factory=dict)
+
+    def write(self, byte: int, line: int):
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def add_constant(self, value: object) -> int:
+        key = constant_key(value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self.constant_index[key] = index
+        return index
+
+
+def constant_key(value: object) -> tuple:
+    # Keyed by type, so that 1.0 and True never share a slot, and by sign,
+    # since 0.0 == -0.0
+    if isinstance(value, float):
+        return (float, value, math.copysign(1.0, value))
+    return (type(value), value)
+
+
+@dataclass
+class Compiler(ExprVisitor, StmtVisitor):
+    chunk: Chunk = field(default_factory=Chunk)
+    line: int = 1
+    # Nodes and finishing steps still to compile, instead of the call stack
+    pending: list[tuple[Callable[[Any, Any], Any], Any]] = \
+        field(default_factory=list)
+    expr_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+    stmt_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+
+
+def compile_statements(statements: list[Stmt]) -> Chunk:
+    compiler = Compiler(
+        visit_binary_expr=visit_binary_expr,  # type: ignore
+        visit_grouping_expr=visit_grouping_expr,  # type: ignore
+        visit_literal_expr=visit_literal_expr,  # type: ignore
+        visit_unary_expr=visit_unary_expr,  # type: ignore
+        visit_expression_stmt=visit_expression_stmt,  # type: ignore
+        visit_print_stmt=visit_print_stmt,  # type: ignore
+        visit_var_stmt=visit_var_stmt,  # type: ignore
+        visit_variable_expr=visit_variable_expr,  # type: ignore
+        visit_assign_expr=visit_assign_expr)  # type: ignore
+    compiler.expr_table = expr_dispatch_table(compiler)
+    compiler.stmt_table = stmt_dispatch_table(compiler)
+    pending = compiler.pending
+    for statement in statements:
+        # Visits push the children they want compiled, so nesting is only
+        # bounded by memory. Last pushed is compiled first.
+        pending.append((compiler.stmt_table[statement.kind], statement))
+        while pending:
+            visit, node = pending.pop()
+            visit(node, compiler)
+    emit(compiler, OP_RETURN)
+    return compiler.chunk
+
+
+def compile_child(expr: Expr, compiler: Compiler):
+    compiler.pending.append((compiler.expr_table[expr.kind], expr))
+
+
+def compile_later(finish: Callable[[Any, Any], Any], node: Expr | Stmt,
+                  compiler: Compiler):
+    # Runs finish once everything pushed after it is compiled
+    compiler.pending.append((finish, node))
+
+
+def emit(compiler: Compiler, byte: int):
+    compiler.chunk.write(byte, compiler.line)
+
+
+def emit_constant(compiler: Compiler, opcode: int, value: object):
+    chunk = compiler.chunk
+    chunk.write(opcode, compiler.line)
+    chunk.write(chunk.add_constant(value), compiler.line)
+
+
+def visit_expression_stmt(stmt: Expression, compiler: Compiler):
+    compile_later(finish_expression_stmt, stmt, compiler)
+    compile_child(stmt.expression, compiler)
+
+
+def finish_expression_stmt(_: Expression, compiler: Compiler):
+    emit(compiler, OP_POP)
+
+
+def visit_print_stmt(stmt: Print, compiler: Compiler):
+    compile_later(finish_print_stmt, stmt, compiler)
+    compile_child(stmt.expression, compiler)
+
+
+def finish_print_stmt(_: Print, compiler: Compiler):
+    emit(compiler, OP_PRINT)
+
+
+def visit_var_stmt(stmt: Var, compiler: Compiler):
+    compile_later(finish_var_stmt, stmt, compiler)
+    if stmt.initializer is not None:
+        compile_child(stmt.initializer, compiler)
+
+
+def finish_var_stmt(stmt: Var, compiler: Compiler):
+    if stmt.initializer is None:
+        emit(compiler, OP_NIL)
+    compiler.line = stmt.name.line
+    emit_constant(compiler, OP_DEFINE_GLOBAL, stmt.name.lexeme)
+
+
+def visit_assign_expr(expr: Assign, compiler: Compiler):
+    compile_later(finish_assign_expr, expr, compiler)
+    compile_child(expr.value, compiler)
+
+
+def finish_assign_expr(expr: Assign, compiler: Compiler):
+    compiler.line = expr.name.line
+    emit_constant(compiler, OP_SET_GLOBAL, expr.name.lexeme)
+
+
+def visit_variable_expr(expr: Variable, compiler: Compiler):
+    compiler.line = expr.name.line
+    emit_constant(compiler, OP_GET_GLOBAL, expr.name.lexeme)
+
+
+def visit_literal_expr(expr: Literal, compiler: Compiler):
+    if expr.value is None:
+        emit(compiler, OP_NIL)
+    elif expr.value is True:
+        emit(compiler, OP_TRUE)
+    elif expr.value is False:
+        emit(compiler, OP_FALSE)
+    else:
+        emit_constant(compiler, OP_CONSTANT, expr.value)
+
+
+def visit_grouping_expr(expr: Grouping, compiler: Compiler):
+    compile_child(expr.expression, compiler)
+
+
+def visit_unary_expr(expr: Unary, compiler: Compiler):
+    compile_later(finish_unary_expr, expr, compiler)
+    compile_child(expr.right, compiler)
+
+
+def finish_unary_expr(expr: Unary, compiler: Compiler):
+    compiler.line = expr.operator.line
+    emit(compiler, UNARY_OPCODES[expr.operator.token_type])
+
+
+def visit_binary_expr(expr: Binary, compiler: Compiler):
+    compile_later(finish_binary_expr, expr, compiler)
+    # Pushed last, the left operand is compiled first
+    compile_child(expr.right, compiler)
+    compile_child(expr.left, compiler)
+
+
+def finish_binary_expr(expr: Binary, compiler: Compiler):
+    compiler.line = expr.operator.line
+    emit(compiler, BINARY_OPCODES[expr.operator.token_type])
+
@@ -0,0 +1,85 @@
+import asyncio
+import dataclasses
+from typing import Iterable
+
+from lox.Expr import Literal
+from lox.Stmt import Stmt, Var
+from lox.error import runtimeError
+from lox.exceptions import RuntimeException
+from lox.governor import check_statement, start_run
+from lox.interpreter import (MAX_RECURSIVE_DEPTH, Visitor, create_interpreter,
+                             evaluate_steps, execute, iterative_visitor)
+from lox.resolver import resolve_stmt
+
+STEPS_PER_YIELD = 1000
+
+
+async def interpret_async(statements: Iterable[Stmt],
+                          interpreter: Visitor | None = None,
+                          steps_per_yield: int = STEPS_PER_YIELD):
+    """Run statements like interpret, letting other tasks run in between.
+
+    Once steps_per_yield nodes have been evaluated the event loop gets a
+    turn. Statements with more nodes than the steps left are evaluated
+    stepwise, so the turn can come in the middle of them. Cancelling the
+    task, asyncio.timeout and asyncio.wait_for stop the script there.
+    """
+    if interpreter is None:
+        interpreter = create_interpreter()
+    resolver = interpreter.resolver
+    environment = interpreter.environment
+    budget = None
+    if interpreter.governor is not None:
+        budget = start_run(interpreter.governor, resolver)
+    steps = steps_per_yield
+    try:
+        for statement in statements:
+            # Every node the resolver counts is evaluated once, see Governor
+            first_node = resolver.nodes
+            resolve_stmt(statement, resolver)
+            environment.reserve(resolver.slot_count)
+            if budget is not None:
+                check_statement(statement, budget, resolver)
+            size = resolver.nodes - first_node
+            if size > steps:
+                steps = await execute_stepwise(statement, interpreter, steps,
+                                               steps_per_yield)
+            elif resolver.max_depth > MAX_RECURSIVE_DEPTH:
+                execute(statement, iterative_visitor(interpreter))
+                steps -= size
+            else:
+                execute(statement, interpreter)
+                steps -= size
+            if steps <= 0:
+                steps = steps_per_yield
+                await asyncio.sleep(0)
+    except RuntimeException as error:
+        runtimeError(error)
+
+
+async def execute_stepwise(statement: Stmt, interpreter: Visitor, steps: int,
+                           steps_per_yield: int) -> int:
+    """Execute statement, yielding whenever its evaluation used up steps.
+
+    Returns the steps left once the statement is done.
+    """
+    if isinstance(statement, Var):
+        expr = statement.initializer
+    else:
+        expr = statement.expression
+    if expr is None:
+        execute(statement, interpreter)
+        return steps
+    pending = [(expr, False)]
+    values: list = []
+    steps = evaluate_steps(pending, values, interpreter, steps)
+    while pending:
+        await asyncio.sleep(0)
+        steps = evaluate_steps(pending, values, interpreter, steps_per_yield)
+    # The statement itself runs on the value it evaluated to
+    value = Literal(values.pop())
+    if isinstance(statement, Var):
+        execute(dataclasses.replace(statement, initializer=value), interpreter)
+    else:
+        execute(dataclasses.replace(statement, expression=value), interpreter)
+    return steps
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Iterator, TextIO
+
+from lox.Enviroment import Environment
+from lox.Stmt import Stmt
+from lox.arena import build_arena, interpret_arena
+from lox.closures import interpret_closures
+from lox.compiler import compile_statements
+from lox.cooperative import STEPS_PER_YIELD, interpret_async
+from lox.governor import Governor
+from lox.interpreter import create_interpreter, interpret
+from lox.optimizer import create_optimizer, optimize
+from lox.output import Sink
+from lox.parser import parse
+from lox.scanner import scan_tokens
+from lox.state import RunState, use_state
+from lox.transpiler import interpret_python
+from lox.vm import run_chunk
+
+
+class Interpreter:
+    """A Lox interpreter that shares no state with any other.
+
+    Each instance owns its variables, its error flags and the stream its
+    output goes to, so instances can run side by side in threads or asyncio
+    tasks of one process. Variables persist from one run to the next, like
+    lines of the prompt. One instance runs one program at a time: calls
+    of run and execute from other threads wait for it, and so do tasks in
+    run_async and execute_async for each other. A call of one kind while a
+    run of the other kind is going on raises RuntimeError instead, a task
+    cannot wait on a thread without blocking its event loop. Output is
+    written to output when a run ends, or kept in sink if one is given.
+
+        interpreter = Interpreter(sink=MemorySink())
+        status = interpreter.run("var a = 1; print a + 2;")
+        interpreter.sink.lines  # ["3"]
+
+    run_async and execute_async run the tree backend as a task that lets
+    the event loop run other tasks every steps_per_yield evaluated nodes.
+    A governor puts quotas
+    on everything the instance runs, for scripts that cannot be trusted.
+
+        async with asyncio.timeout(1.0):
+            status = await interpreter.run_async(source, 500)
+    """
+
+    def __init__(self, backend: str = "tree", output: TextIO | None = None,
+                 optimize: int = 0, sink: Sink | None = None,
+                 governor: Governor | None = None):
+        if governor is not None and backend != "tree":
+            raise ValueError(f"quotas need the tree backend, not {backend}")
+        self.backend = backend
+        self.optimize = optimize
+        self.state = RunState(output=output, sink=sink)
+        self.visitor = create_interpreter(governor)
+        # The vm and the arena keep their variables by name
+        self.globals: dict = {}
+        self.environment = Environment()
+        self.lock = threading.RLock()
+        self.task_lock = asyncio.Lock()
+        # "thread" or "task" while a run of that kind is going on
+        self.running_kind: str | None = None
+        self.kind_lock = threading.Lock()
+
+    @property
+    def output(self) -> TextIO | None:
+        return self.state.output
+
+    @property
+    def sink(self) -> Sink:
+        return self.state.sink  # type: ignore
+
+    @property
+    def had_error(self) -> bool:
+        return self.state.had_error
+
+    @property
+    def had_runtime_error(self) -> bool:
+        return self.state.had_runtime_error
+
+    @property
+    def status(self) -> int:
+        """The exit status python -m lox would give the last run."""
+        if self.state.had_error:
+            return 65
+        if self.state.had_runtime_error:
+            return 70
+        return 0
+
+    @contextmanager
+    def running(self, kind: str) -> Iterator[None]:
+        # Called with the lock of kind held, so the only run that can be
+        # going on is one of the other kind
+        with self.kind_lock:
+            outer = self.running_kind
+            if outer not in (None, kind):
+                raise RuntimeError(
+                    f"the interpreter is busy with a run from a {outer}")
+            self.running_kind = kind
+        try:
+            yield
+        finally:
+            with self.kind_lock:
+                self.running_kind = outer
+
+    def run(self, source: str) -> int:
+        with self.lock, self.running("thread"), use_state(self.state):
+            self.state.had_error = False
+            self.state.had_runtime_error = False
+            statements = parse(scan_tokens(source))
+            if not self.state.had_error:
+                self.execute(statements)
+            return self.status
+
+    def execute(self, statements: list[Stmt]):
+        with self.lock, self.running("thread"), use_state(self.state):
+            try:
+                if self.optimize:
+                    statements = optimize(statements, create_optimizer(
+                        self.optimize, self.visitor.governor))
+
+                if self.backend == "vm":
+                    run_chunk(compile_statements(statements), self.globals)
+                elif self.backend == "arena":
+                    interpret_arena(build_arena(statements), self.environment)
+                elif self.backend == "closure":
+                    interpret_closures(statements, self.visitor)
+                elif self.backend == "python":
+                    interpret_python(statements, self.visitor)
+                else:
+                    interpret(statements, self.visitor)
+            finally:
+                # Whatever the run printed is out when it returns
+                self.sink.flush()
+
+    async def run_async(self, source: str,
+                        steps_per_yield: int = STEPS_PER_YIELD) -> int:
+        async with self.task_lock:
+            with self.running("task"), use_state(self.state):
+                self.state.had_error = False
+                self.state.had_runtime_error = False
+                statements = parse(scan_tokens(source))
+                if not self.state.had_error:
+                    await self.interpret_async(statements, steps_per_yield)
+                return self.status
+
+    async def execute_async(self, statements: list[Stmt],
+                            steps_per_yield: int = STEPS_PER_YIELD):
+        async with self.task_lock:
+            with self.running("task"), use_state(self.state):
+                await self.interpret_async(statements, steps_per_yield)
+
+    async def interpret_async(self, statements: list[Stmt],
+                              steps_per_yield: int):
+        if self.backend != "tree":
+            raise ValueError("running as a task needs the tree backend, "
+                             f"not {self.backend}")
+        try:
+            if self.optimize:
+                statements = optimize(statements, create_optimizer(
+                    self.optimize, self.visitor.governor))
+            await interpret_async(statements, self.visitor, steps_per_yield)
+        finally:
+            self.sink.flush()
@@ -1,7 +1,5 @@
 from lox.exceptions import RuntimeException
-
-HAD_ERROR = False
-HAD_RUNTIME_ERROR = False
+from lox.state import current_sink, current_state, write_line
 
 
 def error(line: int, message: str):
@@ -9,13 +7,24 @@ def error(line: int, message: str):
 
 
 def report(line: int, where: str, message: str):
-    global HAD_ERROR
-    print(f"[{line}] Error {where}: {message}")
-
-    HAD_ERROR = True
+    write_line(f"[{line}] Error {where}: {message}")
+    current_state().had_error = True
+    current_sink().error()
 
 
 def runtimeError(error: RuntimeException):
-    global HAD_RUNTIME_ERROR
-    print(f"{error.message}\n[line {error.token.line}]")
-    HAD_RUNTIME_ERROR = True
+    write_line(f"{error.message}\n[line {error.token.line}]")
+    current_state().had_runtime_error = True
+    current_sink().error()
+
+
+def had_error() -> bool:
+    return current_state().had_error
+
+
+def had_runtime_error() -> bool:
+    return current_state().had_runtime_error
+
+
+def reset_error():
+    current_state().had_error = False
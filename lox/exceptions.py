@@ -1,6 +1,7 @@
 
 
 from lox.token import Token
+from lox.token_type import TokenType
 
 
 class RuntimeException(Exception):
@@ -9,3 +10,27 @@ class RuntimeException(Exception):
         super().__init__(message)
         self.token = token
         self.message = message
+
+
+class LimitExceeded(RuntimeException):
+    """A quota of the governor ran out while running the given line."""
+
+    def __init__(self, line: int, message: str):
+        # Quotas are mostly checked between statements, with no token at hand
+        super().__init__(Token(TokenType.EOF, "", None, line), message)
+
+
+class NodeLimitExceeded(LimitExceeded):
+    pass
+
+
+class DeadlineExceeded(LimitExceeded):
+    pass
+
+
+class StringLimitExceeded(LimitExceeded):
+    pass
+
+
+class EnvironmentLimitExceeded(LimitExceeded):
+    pass
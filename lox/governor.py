@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from time import perf_counter
+
+from lox.Expr import Assign, Binary, Expr, Grouping, Unary, Variable
+from lox.Stmt import Expression, Print, Stmt, Var
+from lox.exceptions import (DeadlineExceeded, EnvironmentLimitExceeded,
+                            NodeLimitExceeded, StringLimitExceeded)
+from lox.resolver import Resolver
+
+
+@dataclass(frozen=True)
+class Governor:
+    """Quotas that keep an untrusted script from taking over a worker.
+
+    A quota of None is not enforced. There are no loops or calls, every node
+    the resolver sees is evaluated once, so its count is what the script
+    costs. Everything but the string size is checked between statements,
+    the string size by the + that would exceed it.
+
+    The node count and the time are per run, each call of interpret starts
+    a new Budget. The variables live on from one run to the next, so their
+    quota is on all of them.
+    """
+    max_nodes: int | None = None
+    seconds: float | None = None
+    max_string: int | None = None
+    max_variables: int | None = None
+
+
+@dataclass
+class Budget:
+    """What one run has used of the quotas of its governor."""
+    governor: Governor
+    # The resolver's node count when the run started
+    first_node: int = 0
+    deadline: float | None = None
+    # For the line of statements without tokens, like print 1;
+    previous: Stmt | None = None
+
+
+def start_run(governor: Governor, resolver: Resolver) -> Budget:
+    deadline = None
+    if governor.seconds is not None:
+        deadline = perf_counter() + governor.seconds
+    return Budget(governor, resolver.nodes, deadline)
+
+
+def check_statement(stmt: Stmt, budget: Budget, resolver: Resolver):
+    governor = budget.governor
+    if governor.max_nodes is not None and \
+            resolver.nodes - budget.first_node > governor.max_nodes:
+        raise NodeLimitExceeded(
+            limit_line(stmt, budget),
+            f"Evaluated more than {governor.max_nodes} nodes.")
+
+    if budget.deadline is not None and perf_counter() > budget.deadline:
+        raise DeadlineExceeded(
+            limit_line(stmt, budget),
+            f"Ran for more than {governor.seconds:g} seconds.")
+
+    if governor.max_variables is not None and \
+            resolver.slot_count > governor.max_variables:
+        raise EnvironmentLimitExceeded(
+            limit_line(stmt, budget),
+            f"Defined more than {governor.max_variables} variables.")
+    budget.previous = stmt
+
+
+def check_concatenation(line: int, left: str, right: str, governor: Governor):
+    if governor.max_string is not None and \
+            len(left) + len(right) > governor.max_string:
+        raise StringLimitExceeded(
+            line, f"String longer than {governor.max_string} characters.")
+
+
+def limit_line(stmt: Stmt, budget: Budget) -> int:
+    # Only worked out once a quota ran out, it costs a walk of the statement
+    return statement_line(stmt, statement_line(budget.previous, 1))
+
+
+def statement_line(node: Expr | Stmt | None, line: int) -> int:
+    # The line of the first token, statements keep none of their own
+    while True:
+        match node:
+            case Var(name) | Assign(name) | Variable(name):
+                return name.line
+            case Unary(operator):
+                return operator.line
+            case Binary(left, operator):
+                node, line = left, operator.line
+            case Expression() | Print():
+                # Its own line when no token in it has one
+                node, line = node.expression, node.line or line
+            case Grouping(expression):
+                node = expression
+            case _:
+                return line
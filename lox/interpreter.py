@@ -1,20 +1,58 @@
-from dataclasses import dataclass
-from lox.Enviroment import Environment
-from lox.Expr import Assign, Binary, Expr, Grouping, Literal, Unary, ExprVisitor, Variable
-from lox.Stmt import Stmt, StmtVisitor, Expression, Var
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+from lox.Enviroment import SlotEnvironment
+from lox.Expr import Assign, Binary, Expr, Grouping, Literal, Unary, ExprVisitor, Variable, expr_dispatch_table
+from lox.Stmt import Stmt, StmtVisitor, Expression, Var, stmt_dispatch_table
 from lox.error import runtimeError
+from lox.governor import Governor, check_statement, start_run
+from lox.state import write_line
+from lox.resolver import Resolver, create_resolver, resolve_stmt
 from lox.exceptions import RuntimeException
-from lox.token import Token
-from lox.token_type import TokenType
+
+
+# Statements nesting deeper than this are evaluated without recursion, two
+# Python frames per level would come close to the recursion limit
+MAX_RECURSIVE_DEPTH = 200
 
 
 @dataclass
 class Visitor(ExprVisitor, StmtVisitor):
-    environment = Environment()
+    environment: SlotEnvironment = field(default_factory=SlotEnvironment)
+    resolver: Resolver = field(default_factory=create_resolver)
+    # Visit functions indexed by node kind, filled in by interpret
+    expr_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+    stmt_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+    # Quotas for untrusted scripts, None runs without any
+    governor: Governor | None = None
+
+
+def interpret(statements: Iterable[Stmt], interpreter: Visitor | None = None):
+    if interpreter is None:
+        interpreter = create_interpreter()
+    resolver = interpreter.resolver
+    environment = interpreter.environment
+    budget = None
+    if interpreter.governor is not None:
+        budget = start_run(interpreter.governor, resolver)
+    try:
+        for statement in statements:
+            # Resolved one at a time, so statements can come from a stream
+            resolve_stmt(statement, resolver)
+            environment.reserve(resolver.slot_count)
+            if budget is not None:
+                check_statement(statement, budget, resolver)
+            if resolver.max_depth > MAX_RECURSIVE_DEPTH:
+                execute(statement, iterative_visitor(interpreter))
+            else:
+                execute(statement, interpreter)
+    except RuntimeException as error:
+        runtimeError(error)
 
 
-def interpret(statements: list[Stmt]):
+def create_interpreter(governor: Governor | None = None) -> Visitor:
     interpreter = Visitor(
+        governor=governor,
         visit_binary_expr=visit_binary_expr,  # type: ignore
         visit_grouping_expr=visit_grouping_expr,  # type: ignore
         visit_literal_expr=visit_literal_expr,  # type: ignore
@@ -24,25 +62,23 @@ def interpret(statements: list[Stmt]):
         visit_var_stmt=visit_var_stmt,  # type: ignore
         visit_variable_expr=visit_variable_expr,  # type: ignore
         visit_assign_expr=visit_assign_expr)  # type: ignore
-    try:
-        for statement in statements:
-            execute(statement, interpreter)
-    except RuntimeException as error:
-        runtimeError(error)
+    interpreter.expr_table = expr_dispatch_table(interpreter)
+    interpreter.stmt_table = stmt_dispatch_table(interpreter)
+    return interpreter
 
 
 def execute(stmt: Stmt, visitor: Visitor):
-    stmt.accept(visitor)
+    visitor.stmt_table[stmt.kind](stmt, visitor)
 
 
 def visit_assign_expr(expr: Assign, cursor: Visitor):
     value = evaluate(expr.value, cursor)
-    cursor.environment.assign(expr.name, value)
+    cursor.environment.assign(expr.slot, expr.name, value)
     return value
 
 
 def visit_variable_expr(expr: Variable, visitor: Visitor):
-    return visitor.environment.get(expr.name)
+    return visitor.environment.get(expr.slot, expr.name)
 
 
 def visit_var_stmt(stmt: Var, visitor: Visitor):
@@ -50,7 +86,7 @@ def visit_var_stmt(stmt: Var, visitor: Visitor):
     if stmt.initializer is not None:
         value = evaluate(stmt.initializer, visitor)
 
-    visitor.environment.define(stmt.name.lexeme, value)
+    visitor.environment.define(stmt.slot, value)
     return None
 
 
@@ -60,7 +96,7 @@ def visit_expression_stmt(stmt: Expression, visitor: Visitor):
 
 def visit_print_stmt(stmt: Expression, visitor: Visitor):
     value = evaluate(stmt.expression, visitor)
-    print(stringify(value))
+    write_line(stringify(value))
 
 
 def visit_literal_expr(expr: Literal, _: Visitor):
@@ -72,104 +108,92 @@ def visit_grouping_expr(expr: Grouping, visitor: Visitor):
 
 
 def visit_unary_expr(expr: Unary, visitor: Visitor) -> float:
-    right = evaluate(expr.right, visitor)
-
-    if expr.operator.token_type == TokenType.BANG:
-        return not is_truthy(right)
-    if expr.operator.token_type == TokenType.MINUS:
-        check_number_operand(expr.operator, right)
-        return -float(right)  # type: ignore
-
-    # Unreachable
-    return None  # type: ignore
+    return expr.operation(expr.operator, evaluate(expr.right, visitor))
 
 
 def visit_binary_expr(expr: Binary, visitor: Visitor):
     left = evaluate(expr.left, visitor)
     right = evaluate(expr.right, visitor)
-
-    match expr.operator.token_type:
-        case TokenType.GREATER:
-            check_number_operands(expr.operator, left, right)
-            return float(left) > float(right)  # type: ignore
-        case TokenType.GREATER_EQUAL:
-            check_number_operands(expr.operator, left, right)
-            return float(left) >= float(right)  # type: ignore
-        case TokenType.LESS:
-            check_number_operands(expr.operator, left, right)
-            return float(left) < float(right)  # type: ignore
-        case TokenType.LESS_EQUAL:
-            check_number_operands(expr.operator, left, right)
-            return float(left) <= float(right)  # type: ignore
-        case TokenType.EQUAL_EQUAL:
-            return is_equal(left, right)
-        case TokenType.BANG_EQUAL:
-            return not is_equal(left, right)
-        case TokenType.MINUS:
-            check_number_operands(expr.operator, left, right)
-            return float(left) - float(right)  # type: ignore
-        case TokenType.PLUS:
-            # I know this is unnecessary as python does the same thing already by nature
-            # so just + would be enough, but this is for educational purpose
-            if isinstance(left, float) and isinstance(right, float):
-                check_number_operands(expr.operator, left, right)
-                return float(left) + float(right)
-            if isinstance(left, str) and isinstance(right, str):
-                return str(left) + str(right)
-        case TokenType.SLASH:
-            check_number_operands(expr.operator, left, right)
-            return float(left) / float(right)  # type: ignore
-        case TokenType.STAR:
-            check_number_operands(expr.operator, left, right)
-            return float(left) * float(right)  # type: ignore
-
-    # Unreachable
-    return None
+    # Picked by the parser from the operator, see lox.operations
+    return expr.operation(expr.operator, left, right, visitor)
 
 
 def evaluate(expr: Expr, visitor: Visitor):
-    return expr.accept(visitor)
-
-
-def is_truthy(value: object) -> bool:
-    if value is None:
-        return False
-    if isinstance(value, bool):
-        return value
-
-    return True
-
-
-def is_equal(a: object, b: object) -> bool:
-    if a is None and b is None:
-        return True
-    if a is None:
-        return False
-
-    return a == b
-
-
-def check_number_operand(operator: Token, operand: object):
-    if isinstance(operand, float):
-        return
-    raise RuntimeException(operator, "Must be a number")
-
-
-def check_number_operands(operator: Token, left: object, right: object):
-    if isinstance(left, float) and isinstance(right, float):
-        return
-
-    raise RuntimeException(operator, "Operands must be a numbers")
+    return visitor.expr_table[expr.kind](expr, visitor)
+
+
+def evaluate_iterative(expr: Expr, visitor: Visitor):
+    """Evaluate like evaluate, with explicit stacks instead of recursion.
+
+    Slower per node, it is used for statements nesting too deep to recurse
+    through, see interpret.
+    """
+    values: list = []
+    evaluate_steps([(expr, False)], values, visitor, -1)
+    return values.pop()
+
+
+def evaluate_steps(pending: list[tuple[Expr, bool]], values: list,
+                   visitor: Visitor, steps: int) -> int:
+    """Evaluate the nodes on pending until it is empty or steps ran out.
+
+    pending holds nodes to evaluate, or to finish once their operands are
+    on values. Every node evaluated takes a step, the steps left are
+    returned, a negative count never runs out. Calling it again with the
+    same stacks goes on where it stopped.
+    """
+    environment = visitor.environment
+    while pending and steps:
+        node, finish = pending.pop()
+        if not finish:
+            steps -= 1
+        if finish:
+            if isinstance(node, Binary):
+                right = values.pop()
+                values.append(node.operation(node.operator, values.pop(),
+                                             right, visitor))
+            elif isinstance(node, Unary):
+                values.append(node.operation(node.operator, values.pop()))
+            elif isinstance(node, Assign):
+                environment.assign(node.slot, node.name, values[-1])
+            # A grouping has the value of its expression
+        elif isinstance(node, Literal):
+            values.append(node.value)
+        elif isinstance(node, Variable):
+            values.append(environment.get(node.slot, node.name))
+        else:
+            pending.append((node, True))
+            if isinstance(node, Binary):
+                # Pushed last, the left operand is evaluated first
+                pending.append((node.right, False))
+                pending.append((node.left, False))
+            elif isinstance(node, Unary):
+                pending.append((node.right, False))
+            elif isinstance(node, Grouping):
+                pending.append((node.expression, False))
+            elif isinstance(node, Assign):
+                pending.append((node.value, False))
+    return steps
+
+
+def iterative_visitor(visitor: Visitor) -> Visitor:
+    # Shares the variables of visitor, but every expression is evaluated
+    # by evaluate_iterative
+    return dataclasses.replace(
+        visitor, expr_table=[evaluate_iterative] * len(visitor.expr_table))
 
 
 def stringify(obj: object):
+    if type(obj) is float:
+        # Whole numbers are printed without going through "1.0". str()
+        # switches to exponents from 1e16 on and keeps the sign of -0.0,
+        # those still take the slow path.
+        if obj.is_integer() and -1e16 < obj < 1e16 and obj:
+            return str(int(obj))
+        text = str(obj)
+        return text[:-2] if text.endswith(".0") else text
+
     if obj is None:
         return "nil"
 
-    if isinstance(obj, float):
-        text = str(obj)
-        if text.endswith(".0"):
-            text = text[:-2]
-        return text
-
     return str(obj)
@@ -0,0 +1,94 @@
+import sys
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, TextIO
+
+from lox.Expr import Assign, Binary, Expr, Grouping, Unary
+from lox.Stmt import Expression, Print, Stmt, Var
+from lox.token_buffer import TokenBuffer
+
+
+@dataclass
+class Phase:
+    name: str
+    # Highest traced memory while the phase ran, above what it started with
+    peak: int = 0
+    # Memory the phase left allocated once it was done
+    retained: int = 0
+    objects: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class MemStats:
+    """Memory of each phase of a run, measured with tracemalloc."""
+    source_bytes: int
+    phases: list[Phase] = field(default_factory=list)
+
+
+@contextmanager
+def measure(stats: MemStats, name: str) -> Iterator[Phase]:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    phase = Phase(name)
+    stats.phases.append(phase)
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    try:
+        yield phase
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        phase.peak = peak - before
+        phase.retained = current - before
+
+
+def count_tokens(tokens: Iterable, counter: Counter):
+    if isinstance(tokens, TokenBuffer):
+        # Tokens are rows of arrays, no object exists per token
+        counter["TokenBuffer rows"] += len(tokens)
+        return
+    counter.update(type(token).__name__ for token in tokens)
+
+
+def count_nodes(statements: Iterable[Stmt], counter: Counter):
+    stack: list[Stmt | Expr | None] = list(statements)
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        counter[type(node).__name__] += 1
+        match node:
+            case Binary(left, _, right):
+                stack += (left, right)
+            case Unary(_, right):
+                stack.append(right)
+            case Grouping(expression) | Expression(expression) | Print(expression):
+                stack.append(expression)
+            case Assign(_, value):
+                stack.append(value)
+            case Var(_, initializer):
+                stack.append(initializer)
+
+
+def count_values(values: Iterable, counter: Counter):
+    # A slot is one environment entry, the value it holds is counted by type
+    for value in values:
+        counter["slot"] += 1
+        counter[type(value).__name__] += 1
+
+
+def print_report(stats: MemStats, file: TextIO = sys.stderr):
+    source = max(stats.source_bytes, 1)
+    print(f"[mem-stats] source {stats.source_bytes:,} bytes", file=file)
+    print(f"{'phase':<10} {'peak MB':>9} {'retained MB':>12} "
+          f"{'peak/byte':>10} {'retained/byte':>14}", file=file)
+    for phase in stats.phases:
+        print(f"{phase.name:<10} {phase.peak / 2 ** 20:9.2f} "
+              f"{phase.retained / 2 ** 20:12.2f} {phase.peak / source:10.1f} "
+              f"{phase.retained / source:14.1f}", file=file)
+    for phase in stats.phases:
+        if phase.objects:
+            counts = ", ".join(f"{name} {count:,}" for name, count
+                               in phase.objects.most_common())
+            print(f"objects after {phase.name}: {counts}", file=file)
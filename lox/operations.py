@@ -0,0 +1,101 @@
+import operator as python_operator
+from typing import Any, Callable
+
+from lox.exceptions import RuntimeException
+from lox.governor import check_concatenation
+from lox.token import Token
+from lox.token_type import TokenType
+
+# The operation of a Binary node gets (operator, left, right, visitor), the
+# operation of a Unary node (operator, right). The parser picks them from
+# the tables at the bottom, so evaluating a node is a single call.
+BinaryOperation = Callable[[Token, Any, Any, Any], Any]
+UnaryOperation = Callable[[Token, Any], Any]
+
+
+def arithmetic(operation: Callable[[float, float], Any]) -> BinaryOperation:
+    def checked(operator: Token, left: object, right: object, _) -> Any:
+        # Numbers are always floats, bool is no subclass of float
+        if type(left) is float and type(right) is float:
+            return operation(left, right)
+        raise RuntimeException(operator, "Operands must be a numbers")
+    return checked
+
+
+def add(operator: Token, left: object, right: object, visitor) -> Any:
+    if type(left) is float and type(right) is float:
+        return left + right
+    if type(left) is str and type(right) is str:
+        if visitor.governor is not None:
+            check_concatenation(operator.line, left, right, visitor.governor)
+        return left + right
+    # Mixed operands are nil, not an error
+    return None
+
+
+def equal(_: Token, left: object, right: object, __) -> bool:
+    return is_equal(left, right)
+
+
+def not_equal(_: Token, left: object, right: object, __) -> bool:
+    return not is_equal(left, right)
+
+
+def negate(operator: Token, right: object) -> float:
+    if type(right) is float:
+        return -right
+    raise RuntimeException(operator, "Must be a number")
+
+
+def bang(_: Token, right: object) -> bool:
+    return not is_truthy(right)
+
+
+def is_truthy(value: object) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+
+    return True
+
+
+def is_equal(a: object, b: object) -> bool:
+    if a is None and b is None:
+        return True
+    if a is None:
+        return False
+
+    return a == b
+
+
+def check_number_operand(operator: Token, operand: object):
+    if isinstance(operand, float):
+        return
+    raise RuntimeException(operator, "Must be a number")
+
+
+def check_number_operands(operator: Token, left: object, right: object):
+    if isinstance(left, float) and isinstance(right, float):
+        return
+
+    raise RuntimeException(operator, "Operands must be a numbers")
+
+
+BINARY_OPERATIONS: dict[TokenType, BinaryOperation] = {
+    TokenType.GREATER: arithmetic(python_operator.gt),
+    TokenType.GREATER_EQUAL: arithmetic(python_operator.ge),
+    TokenType.LESS: arithmetic(python_operator.lt),
+    TokenType.LESS_EQUAL: arithmetic(python_operator.le),
+    TokenType.EQUAL_EQUAL: equal,
+    TokenType.BANG_EQUAL: not_equal,
+    TokenType.MINUS: arithmetic(python_operator.sub),
+    TokenType.PLUS: add,
+    TokenType.SLASH: arithmetic(python_operator.truediv),
+    TokenType.STAR: arithmetic(python_operator.mul),
+}
+
+UNARY_OPERATIONS: dict[TokenType, UnaryOperation] = {
+    TokenType.BANG: bang,
+    TokenType.MINUS: negate,
+}
@@ -0,0 +1,300 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
+
+from lox.Expr import (Assign, Binary, Expr, ExprVisitor, Grouping, Literal,
+                      Unary, Variable, expr_dispatch_table)
+from lox.Stmt import (Expression, Print, Stmt, StmtVisitor, Var,
+                      stmt_dispatch_table)
+from lox.exceptions import RuntimeException
+from lox.governor import Governor
+from lox.interpreter import Visitor, create_interpreter, evaluate
+from lox.token_type import TokenType
+
+# Operators whose result is always a number, or always a bool, whenever they
+# do not raise.
+NUMBER_OPERATORS = {TokenType.MINUS, TokenType.STAR, TokenType.SLASH}
+BOOL_OPERATORS = {
+    TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS,
+    TokenType.LESS_EQUAL, TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL
+}
+
+
+@dataclass
+class Optimizer(ExprVisitor, StmtVisitor):
+    """Rewrites statements into equivalent, smaller ones.
+
+    Level 1 drops Grouping wrappers and folds subtrees whose operands are all
+    literals. Level 2 also applies identities that hold for every operand of
+    a known type, such as x * 1 for numbers and !!x for bools, and removes
+    expression statements without effect.
+    """
+    level: int = 1
+    nodes_before: int = 0
+    nodes_after: int = 0
+    folder: Visitor = field(default_factory=create_interpreter)
+    # Nodes and finishing steps still to run, instead of the call stack, and
+    # the optimized children the finishing steps take
+    pending: list[tuple[Callable[[Any, Any], Any], Any]] = \
+        field(default_factory=list)
+    results: list[Expr] = field(default_factory=list)
+    expr_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+    stmt_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+
+    @property
+    def nodes_removed(self) -> int:
+        return self.nodes_before - self.nodes_after
+
+
+def create_optimizer(level: int,
+                     governor: Governor | None = None) -> Optimizer:
+    # Folding runs under the quotas of the script, a string too long for
+    # them is left to fail at runtime like any other folding error
+    level = min(level, 2)
+    optimizer = Optimizer(
+        folder=create_interpreter(governor),
+        visit_binary_expr=visit_binary_expr,  # type: ignore
+        visit_grouping_expr=visit_grouping_expr,  # type: ignore
+        visit_literal_expr=visit_literal_expr,  # type: ignore
+        visit_unary_expr=visit_unary_expr,  # type: ignore
+        visit_expression_stmt=visit_expression_stmt,  # type: ignore
+        visit_print_stmt=visit_print_stmt,  # type: ignore
+        visit_var_stmt=visit_var_stmt,  # type: ignore
+        visit_variable_expr=visit_variable_expr,  # type: ignore
+        visit_assign_expr=visit_assign_expr,  # type: ignore
+        level=level)
+    optimizer.expr_table = expr_dispatch_table(optimizer)
+    optimizer.stmt_table = stmt_dispatch_table(optimizer)
+    return optimizer
+
+
+def optimize(statements: list[Stmt],
+             optimizer: Optimizer) -> list[Stmt]:
+    optimized = []
+    for statement in statements:
+        optimizer.nodes_before += count_nodes(statement)
+        statement = optimize_stmt(statement, optimizer)
+        if statement is not None:
+            optimizer.nodes_after += count_nodes(statement)
+            optimized.append(statement)
+    return optimized
+
+
+def optimize_stream(statements: Iterable[Stmt | None],
+                    optimizer: Optimizer) -> Iterator[Stmt | None]:
+    for statement in statements:
+        if statement is None:
+            # Keep the marker of a statement that failed to parse
+            yield None
+        else:
+            yield from optimize([statement], optimizer)
+
+
+def optimize_stmt(stmt: Stmt, optimizer: Optimizer) -> Stmt | None:
+    return optimizer.stmt_table[stmt.kind](stmt, optimizer)
+
+
+def optimize_expr(expr: Expr, optimizer: Optimizer) -> Expr:
+    # Visits push the children they want optimized, so nesting is only
+    # bounded by memory. Last pushed is optimized first.
+    pending = optimizer.pending
+    bottom = len(pending)
+    optimize_child(expr, optimizer)
+    while len(pending) > bottom:
+        visit, node = pending.pop()
+        visit(node, optimizer)
+    return optimizer.results.pop()
+
+
+def optimize_child(expr: Expr, optimizer: Optimizer):
+    optimizer.pending.append((optimizer.expr_table[expr.kind], expr))
+
+
+def optimize_later(finish: Callable[[Any, Any], Any], expr: Expr,
+                   optimizer: Optimizer):
+    # Runs finish once everything pushed after it is optimized, with their
+    # results on top of optimizer.results
+    optimizer.pending.append((finish, expr))
+
+
+def visit_expression_stmt(stmt: Expression, optimizer: Optimizer):
+    expression = optimize_expr(stmt.expression, optimizer)
+    if optimizer.level >= 2 and isinstance(expression, Literal):
+        return None
+    return Expression(expression, stmt.line)
+
+
+def visit_print_stmt(stmt: Print, optimizer: Optimizer):
+    return Print(optimize_expr(stmt.expression, optimizer), stmt.line)
+
+
+def visit_var_stmt(stmt: Var, optimizer: Optimizer):
+    if stmt.initializer is None:
+        return stmt
+    return Var(stmt.name, optimize_expr(stmt.initializer, optimizer))
+
+
+def visit_assign_expr(expr: Assign, optimizer: Optimizer):
+    optimize_later(finish_assign, expr, optimizer)
+    optimize_child(expr.value, optimizer)
+
+
+def finish_assign(expr: Assign, optimizer: Optimizer):
+    results = optimizer.results
+    results.append(Assign(expr.name, results.pop()))
+
+
+def visit_variable_expr(expr: Variable, optimizer: Optimizer):
+    optimizer.results.append(expr)
+
+
+def visit_literal_expr(expr: Literal, optimizer: Optimizer):
+    optimizer.results.append(expr)
+
+
+def visit_grouping_expr(expr: Grouping, optimizer: Optimizer):
+    # Replaced by its optimized expression
+    optimize_child(expr.expression, optimizer)
+
+
+def visit_unary_expr(expr: Unary, optimizer: Optimizer):
+    optimize_later(finish_unary, expr, optimizer)
+    optimize_child(expr.right, optimizer)
+
+
+def finish_unary(expr: Unary, optimizer: Optimizer):
+    optimizer.results.append(simplify_unary(expr, optimizer))
+
+
+def simplify_unary(expr: Unary, optimizer: Optimizer) -> Expr:
+    right = optimizer.results.pop()
+    folded = fold(Unary(expr.operator, right, expr.operation), optimizer)
+
+    if optimizer.level >= 2 and isinstance(folded, Unary):
+        inner = folded.right
+        if (isinstance(inner, Unary)
+                and inner.operator.token_type == folded.operator.token_type):
+            operand = inner.right
+            # !!x is x and -(-x) is x, as long as x already is a bool or
+            # a number respectively.
+            if folded.operator.token_type == TokenType.BANG and is_bool(operand):
+                return operand
+            if folded.operator.token_type == TokenType.MINUS and is_number(operand):
+                return operand
+
+    return folded
+
+
+def visit_binary_expr(expr: Binary, optimizer: Optimizer):
+    optimize_later(finish_binary, expr, optimizer)
+    # Pushed last, the left operand is optimized first
+    optimize_child(expr.right, optimizer)
+    optimize_child(expr.left, optimizer)
+
+
+def finish_binary(expr: Binary, optimizer: Optimizer):
+    results = optimizer.results
+    right = results.pop()
+    folded = fold(Binary(results.pop(), expr.operator, right, expr.operation),
+                  optimizer)
+
+    if optimizer.level >= 2 and isinstance(folded, Binary):
+        folded = simplify(folded)
+    results.append(folded)
+
+
+def fold(expr: Unary | Binary, optimizer: Optimizer) -> Expr:
+    operands = [expr.right] if isinstance(expr, Unary) else [expr.left, expr.right]
+    if not all(isinstance(operand, Literal) for operand in operands):
+        return expr
+
+    try:
+        return Literal(evaluate(expr, optimizer.folder))
+    except (RuntimeException, ArithmeticError):
+        # Leave it to fail at runtime, on its own line and in program order
+        return expr
+
+
+def simplify(expr: Binary) -> Expr:
+    """Identities that keep the exact result, including the sign of zero.
+
+    x * 1, 1 * x, x / 1 and x - 0 are x for every number x, but x + 0 is not
+    (-0 + 0 is 0), so only those four are applied, and only when the other
+    operand is known to be a number so that type errors are not lost.
+    """
+    token_type = expr.operator.token_type
+    left, right = expr.left, expr.right
+
+    if token_type == TokenType.STAR:
+        if is_literal(right, 1.0) and is_number(left):
+            return left
+        if is_literal(left, 1.0) and is_number(right):
+            return right
+    elif token_type == TokenType.SLASH:
+        if is_literal(right, 1.0) and is_number(left):
+            return left
+    elif token_type == TokenType.MINUS:
+        if is_literal(right, 0.0) and is_number(left):
+            return left
+
+    return expr
+
+
+def is_literal(expr: Expr, value: float) -> bool:
+    # -0 equals 0 but is not interchangeable with it, so compare signs too
+    return (isinstance(expr, Literal) and isinstance(expr.value, float)
+            and expr.value == value
+            and math.copysign(1.0, expr.value) == math.copysign(1.0, value))
+
+
+def is_number(expr: Expr) -> bool:
+    # A + is a number when both operands are, its operands go on a stack as
+    # chains of + nest deeper than Python recurses
+    operands = [expr]
+    while operands:
+        expr = operands.pop()
+        if isinstance(expr, Literal):
+            if not isinstance(expr.value, float):
+                return False
+        elif isinstance(expr, Binary):
+            if expr.operator.token_type == TokenType.PLUS:
+                operands += (expr.right, expr.left)
+            elif expr.operator.token_type not in NUMBER_OPERATORS:
+                return False
+        elif isinstance(expr, Unary):
+            if expr.operator.token_type != TokenType.MINUS:
+                return False
+        else:
+            return False
+    return True
+
+
+def is_bool(expr: Expr) -> bool:
+    if isinstance(expr, Literal):
+        return isinstance(expr.value, bool)
+    if isinstance(expr, Binary):
+        return expr.operator.token_type in BOOL_OPERATORS
+    if isinstance(expr, Unary):
+        return expr.operator.token_type == TokenType.BANG
+    return False
+
+
+def count_nodes(node: Stmt | Expr | None) -> int:
+    count = 0
+    pending = [node]
+    while pending:
+        match pending.pop():
+            case None:
+                continue
+            case Binary(left, _, right):
+                pending += (left, right)
+            case Unary(_, right):
+                pending.append(right)
+            case Grouping(expression) | Expression(expression) | Print(expression):
+                pending.append(expression)
+            case Assign(_, value):
+                pending.append(value)
+            case Var(_, initializer):
+                pending.append(initializer)
+        count += 1
+    return count
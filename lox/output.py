@@ -0,0 +1,74 @@
+import sys
+from typing import Protocol, TextIO
+
+# Large enough that printing a line is an append, not a write
+FLUSH_SIZE = 1 << 16
+
+
+class Sink(Protocol):
+    """Where the lines of print statements and error reports go."""
+
+    def write_line(self, text: str): ...
+
+    def error(self): ...
+
+    def flush(self): ...
+
+
+class StreamSink:
+    """Collects lines and writes them to a stream in large chunks.
+
+    The lines are written once flush_size characters are waiting, when an
+    error is reported if flush_on_error is set, and whenever flush() is
+    called, which the owner of the sink does when the run exits. A
+    flush_size of 0 writes every line right away. A stream of None means
+    whatever sys.stdout is at the time of the write.
+    """
+
+    def __init__(self, stream: TextIO | None = None,
+                 flush_size: int = FLUSH_SIZE, flush_on_error: bool = True):
+        self.stream = stream
+        self.flush_size = flush_size
+        self.flush_on_error = flush_on_error
+        self.lines: list[str] = []
+        self.size = 0
+
+    def write_line(self, text: str):
+        self.lines.append(text)
+        self.size += len(text) + 1
+        if self.size >= self.flush_size:
+            self.flush()
+
+    def error(self):
+        if self.flush_on_error:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        # The empty string gives the newline after the last line
+        self.lines.append("")
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write("\n".join(self.lines))
+        stream.flush()
+        self.lines = []
+        self.size = 0
+
+
+class MemorySink:
+    """Keeps every line, for embedding and for checking what a run printed."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def write_line(self, text: str):
+        self.lines.append(text)
+
+    def error(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def getvalue(self) -> str:
+        return "".join(line + "\n" for line in self.lines)
@@ -1,7 +1,10 @@
+from collections import deque
 from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
 from lox import Expr
 from lox import Stmt
 import lox
+from lox.operations import BINARY_OPERATIONS, UNARY_OPERATIONS
 from lox.token import Token
 from lox.token_type import TokenType
 
@@ -10,18 +13,46 @@ class ParseError(Exception):
     pass
 
 
+class TokenWindow:
+    """Index a token iterator like a list, keeping only the last few tokens.
+
+    The parser never looks further back than the previous token, so a window
+    of two is enough to parse from a stream in constant memory.
+    """
+
+    def __init__(self, tokens: Iterable[Token], size: int = 2):
+        self.tokens = iter(tokens)
+        self.buffer: deque[Token] = deque(maxlen=size)
+        self.offset = 0
+
+    def __getitem__(self, index: int) -> Token:
+        while index >= self.offset + len(self.buffer):
+            if len(self.buffer) == self.buffer.maxlen:
+                self.offset += 1
+            self.buffer.append(next(self.tokens))
+
+        if index < self.offset:
+            raise IndexError(f"Token {index} is no longer buffered")
+        return self.buffer[index - self.offset]
+
+
 @dataclass
 class Cursor:
-    tokens: list[Token]
+    tokens: list[Token] | TokenWindow
     current: int = 0
 
 
 def parse(tokens: list[Token]):
-    cursor = Cursor(tokens)
-    statements: list[Stmt.Stmt | None] = []
+    return list(statements_from(Cursor(tokens)))
+
+
+def parse_stream(tokens: Iterable[Token]) -> Iterator[Stmt.Stmt | None]:
+    return statements_from(Cursor(TokenWindow(tokens)))
+
+
+def statements_from(cursor: Cursor) -> Iterator[Stmt.Stmt | None]:
     while not is_at_end(cursor):
-        statements.append(declaration(cursor))
-    return statements
+        yield declaration(cursor)
 
 
 def declaration(cursor: Cursor) -> Stmt.Stmt | None:
@@ -54,111 +85,147 @@ def statement(cursor: Cursor) -> Stmt.Stmt:
 
 
 def printStatement(cursor: Cursor):
+    line = previous(cursor).line
     value = expression(cursor)
     consume(cursor, TokenType.SEMICOLON, "Expect ';' after value")
-    return Stmt.Print(value)
+    return Stmt.Print(value, line)
 
 
 def expressionStatement(cursor: Cursor):
+    line = peek(cursor).line
     expr = expression(cursor)
     consume(cursor, TokenType.SEMICOLON, "Expect ';' after expression")
-    return Stmt.Expression(expr)
-
-
-def expression(cursor: Cursor) -> Expr.Expr:
-    return assignment(cursor)
-
+    return Stmt.Expression(expr, line)
 
-def assignment(cursor: Cursor) -> Expr.Expr:
-    expr = equality(cursor)
-
-    if match(cursor, TokenType.EQUAL):
-        equals = previous(cursor)
-        value = assignment(cursor)
-        if isinstance(expr, Expr.Variable):
-            name = expr.name
-            return Expr.Assign(name, value)
 
-        error(equals, "Invalid Assignment Target")
+# The parser is a Pratt parser driven by tables keyed by token type: what
+# a token does where an operand is expected, and after one. Operators wait
+# on an explicit stack with how tightly they bind, an open parenthesis
+# binds nothing and only waits for its ")".
+GROUP = 0
+ASSIGNMENT = 1
+UNARY = 6
 
-    return expr
 
+def false_literal(_: Token) -> Expr.Expr:
+    return Expr.Literal(False)
 
-def equality(cursor: Cursor):
-    expr = comparison(cursor)
 
-    while match(cursor, TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-        operator = previous(cursor)
-        right = comparison(cursor)
-        expr = Expr.Binary(expr, operator, right)
+def true_literal(_: Token) -> Expr.Expr:
+    return Expr.Literal(True)
 
-    return expr
 
+def nil_literal(_: Token) -> Expr.Expr:
+    return Expr.Literal(None)
 
-def comparison(cursor: Cursor):
-    expr = term(cursor)
 
-    while match(cursor, TokenType.GREATER, TokenType.GREATER_EQUAL,
-                TokenType.LESS, TokenType.LESS_EQUAL):
-        operator = previous(cursor)
-        right = term(cursor)
-        expr = Expr.Binary(expr, operator, right)
+def token_literal(token: Token) -> Expr.Expr:
+    return Expr.Literal(token.literal)
 
-    return expr
 
+OPERANDS: dict[TokenType, Callable[[Token], Expr.Expr]] = {
+    TokenType.FALSE: false_literal,
+    TokenType.TRUE: true_literal,
+    TokenType.NIL: nil_literal,
+    TokenType.NUMBER: token_literal,
+    TokenType.STRING: token_literal,
+    TokenType.IDENTIFIER: Expr.Variable,
+}
 
-def term(cursor: Cursor):
-    expr = factor(cursor)
+PREFIX_PRECEDENCE = {
+    TokenType.BANG: UNARY,
+    TokenType.MINUS: UNARY,
+    TokenType.LEFT_PAREN: GROUP,
+}
 
-    while match(cursor, TokenType.MINUS, TokenType.PLUS):
-        operator = previous(cursor)
-        right = factor(cursor)
+INFIX_PRECEDENCE = {
+    TokenType.EQUAL: ASSIGNMENT,
+    TokenType.BANG_EQUAL: 2,
+    TokenType.EQUAL_EQUAL: 2,
+    TokenType.GREATER: 3,
+    TokenType.GREATER_EQUAL: 3,
+    TokenType.LESS: 3,
+    TokenType.LESS_EQUAL: 3,
+    TokenType.MINUS: 4,
+    TokenType.PLUS: 4,
+    TokenType.SLASH: 5,
+    TokenType.STAR: 5,
+}
 
-        expr = Expr.Binary(expr, operator, right)
 
-    return expr
-
-
-def factor(cursor: Cursor):
-    expr = unary(cursor)
-
-    while match(cursor, TokenType.SLASH, TokenType.STAR):
-        operator = previous(cursor)
-        right = unary(cursor)
-        expr = Expr.Binary(expr, operator, right)
-
-    return expr
-
-
-def unary(cursor: Cursor):
-    if match(cursor, TokenType.BANG, TokenType.MINUS):
-        operator = previous(cursor)
-        right = unary(cursor)
-        return Expr.Unary(operator, right)
-
-    return primary(cursor)
-
-
-def primary(cursor: Cursor):
-    if match(cursor, TokenType.FALSE):
-        return Expr.Literal(False)
-    if match(cursor, TokenType.TRUE):
-        return Expr.Literal(True)
-    if match(cursor, TokenType.NIL):
-        return Expr.Literal(None)
-
-    if match(cursor, TokenType.NUMBER, TokenType.STRING):
-        return Expr.Literal(previous(cursor).literal)
-
-    if match(cursor, TokenType.IDENTIFIER):
-        return Expr.Variable(previous(cursor))
-
-    if match(cursor, TokenType.LEFT_PAREN):
-        expr = expression(cursor)
-        consume(cursor, TokenType.RIGHT_PAREN, "Expected ) after expression")
-        return Expr.Grouping(expr)
-
-    raise error(peek(cursor), "Expected Expression")
+def expression(cursor: Cursor) -> Expr.Expr:
+    """Parse the grammar assignment → equality → … → unary → primary.
+
+    Every token is looked at once and dispatched through the tables above,
+    instead of going through match() for each level of the grammar. The
+    stack takes the place of recursion, so expressions nest as deep as
+    memory allows. The trees and errors are the ones recursive descent
+    gives.
+    """
+    tokens = cursor.tokens
+    operands: list[Expr.Expr] = []
+    operators: list[tuple[int, Token]] = []
+    while True:
+        # Prefix operators and open parentheses, then an operand
+        token = tokens[cursor.current]
+        precedence = PREFIX_PRECEDENCE.get(token.token_type)
+        while precedence is not None:
+            operators.append((precedence, token))
+            cursor.current += 1
+            token = tokens[cursor.current]
+            precedence = PREFIX_PRECEDENCE.get(token.token_type)
+        operand = OPERANDS.get(token.token_type)
+        if operand is None:
+            raise error(token, "Expected Expression")
+        cursor.current += 1
+        operands.append(operand(token))
+
+        # Then either an infix operator, or the end of groups and finally of
+        # the whole expression
+        while True:
+            token = tokens[cursor.current]
+            precedence = INFIX_PRECEDENCE.get(token.token_type)
+            if precedence is not None:
+                if precedence == ASSIGNMENT:
+                    # Right associative, a = b = c leaves a = waiting for c
+                    reduce(operands, operators, ASSIGNMENT + 1)
+                elif operators and operators[-1][0] >= precedence:
+                    reduce(operands, operators, precedence)
+                operators.append((precedence, token))
+                cursor.current += 1
+                break
+
+            reduce(operands, operators, ASSIGNMENT)
+            if not operators:
+                return operands.pop()
+            if token.token_type != TokenType.RIGHT_PAREN:
+                raise error(token, "Expected ) after expression")
+            cursor.current += 1
+            operators.pop()
+            operands.append(Expr.Grouping(operands.pop()))
+
+
+def reduce(operands: list[Expr.Expr], operators: list[tuple[int, Token]],
+           precedence: int):
+    # Build the nodes of the waiting operators binding at least this tightly
+    while operators and operators[-1][0] >= precedence:
+        operator_precedence, operator = operators.pop()
+        right = operands.pop()
+        if operator_precedence == UNARY:
+            operands.append(Expr.Unary(
+                operator, right, UNARY_OPERATIONS[operator.token_type]))
+        elif operator_precedence == ASSIGNMENT:
+            target = operands.pop()
+            if isinstance(target, Expr.Variable):
+                operands.append(Expr.Assign(target.name, right))
+            else:
+                # Reported, but parsing goes on with the target
+                error(operator, "Invalid Assignment Target")
+                operands.append(target)
+        else:
+            operands.append(Expr.Binary(
+                operands.pop(), operator, right,
+                BINARY_OPERATIONS[operator.token_type]))
 
 
 def consume(cursor: Cursor, type: TokenType, message: str):
@@ -0,0 +1,188 @@
+import marshal
+import sys
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, TextIO
+
+from lox.Expr import Assign, Binary, Expr, Unary, Variable
+from lox.Stmt import Stmt, Var
+from lox.governor import statement_line
+from lox.interpreter import Visitor
+
+
+@dataclass
+class Stats:
+    count: int = 0
+    # Time spent in the node itself, and with its children, counted once
+    # for nested nodes of the same key like cProfile does for recursion.
+    own: float = 0.0
+    total: float = 0.0
+
+
+@dataclass
+class Frame:
+    """A node being evaluated, and the time its children took so far."""
+    node_type: str
+    operator: str | None
+    line: int
+    label: str
+    children: float = 0.0
+
+
+@dataclass
+class Profile:
+    """What the profiled interpreter evaluated, and how long it took.
+
+    Every node is counted under its node type, under its operator if it has
+    one, under its source line, and under its stack of labels for the
+    flamegraph and pstats output. Nodes without a token of their own, like
+    literals, count on the line of the statement they are in.
+    """
+    script: str = "<lox>"
+    node_types: dict[str, Stats] = field(default_factory=dict)
+    operators: dict[str, Stats] = field(default_factory=dict)
+    lines: dict[int, Stats] = field(default_factory=dict)
+    # (line, label) of a node, and of its parent for the callers of pstats
+    functions: dict[tuple[int, str], Stats] = field(default_factory=dict)
+    callers: dict[tuple[int, str], dict[tuple[int, str], Stats]] = field(
+        default_factory=dict)
+    stacks: dict[tuple[str, ...], float] = field(default_factory=dict)
+    stack: list[Frame] = field(default_factory=list)
+    line: int = 0
+
+
+def instrument(interpreter: Visitor, profile: Profile):
+    """Route every visit of interpreter through profile.
+
+    Only the dispatch tables of this interpreter change, an interpreter
+    that is not instrumented runs exactly the code it did before.
+    """
+    interpreter.expr_table = [profiled(visit, profile, False)
+                              for visit in interpreter.expr_table]
+    interpreter.stmt_table = [profiled(visit, profile, True)
+                              for visit in interpreter.stmt_table]
+
+
+def profiled(visit: Callable[[Any, Any], Any], profile: Profile,
+             statement: bool) -> Callable[[Any, Any], Any]:
+    stack = profile.stack
+
+    def profiled_visit(node: Expr | Stmt, visitor: Visitor):
+        if statement:
+            profile.line = statement_line(node, profile.line)
+        operator = operator_of(node)
+        line = line_of(node, profile.line)
+        node_type = type(node).__name__
+        label = node_type if operator is None else f"{node_type} {operator}"
+        frame = Frame(node_type, operator, line, label)
+
+        stack.append(frame)
+        start = perf_counter()
+        try:
+            return visit(node, visitor)
+        finally:
+            elapsed = perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1].children += elapsed
+            record(profile, frame, elapsed)
+
+    return profiled_visit
+
+
+def record(profile: Profile, frame: Frame, elapsed: float):
+    own = elapsed - frame.children
+    outer = profile.stack
+    key = (frame.line, frame.label)
+    recursive = any(other.label == frame.label and other.line == frame.line
+                    for other in outer)
+
+    add(profile.node_types, frame.node_type, own, elapsed,
+        any(other.node_type == frame.node_type for other in outer))
+    if frame.operator is not None:
+        add(profile.operators, frame.operator, own, elapsed,
+            any(other.operator == frame.operator for other in outer))
+    add(profile.lines, frame.line, own, elapsed,
+        any(other.line == frame.line for other in outer))
+    add(profile.functions, key, own, elapsed, recursive)
+    if outer:
+        callers = profile.callers.setdefault(key, {})
+        add(callers, (outer[-1].line, outer[-1].label), own, elapsed,
+            recursive)
+
+    labels = tuple(other.label for other in outer) + (frame.label,)
+    profile.stacks[labels] = profile.stacks.get(labels, 0.0) + own
+
+
+def add(table: dict, key: Any, own: float, elapsed: float, nested: bool):
+    stats = table.get(key)
+    if stats is None:
+        stats = table[key] = Stats()
+    stats.count += 1
+    stats.own += own
+    if not nested:
+        stats.total += elapsed
+
+
+def operator_of(node: Expr | Stmt) -> str | None:
+    if isinstance(node, (Binary, Unary)):
+        return node.operator.token_type.name
+    return None
+
+
+def line_of(node: Expr | Stmt, line: int) -> int:
+    if isinstance(node, (Binary, Unary)):
+        return node.operator.line
+    if isinstance(node, (Assign, Variable, Var)):
+        return node.name.line
+    return line
+
+
+def print_report(profile: Profile, file: TextIO = sys.stderr, limit: int = 20):
+    total = sum(stats.own for stats in profile.node_types.values())
+    print(f"[profile] {total:.6f} s evaluating "
+          f"{sum(stats.count for stats in profile.node_types.values()):,} "
+          f"nodes", file=file)
+    for title, table in (("node type", profile.node_types),
+                         ("operator", profile.operators),
+                         ("line", profile.lines)):
+        print(file=file)
+        print(f"{title:<16} {'count':>10} {'own s':>10} {'own %':>6} "
+              f"{'total s':>10}", file=file)
+        rows = sorted(table.items(), key=lambda row: row[1].own, reverse=True)
+        for key, stats in rows[:limit]:
+            share = stats.own / total * 100 if total else 0.0
+            print(f"{key!s:<16} {stats.count:>10,} {stats.own:10.6f} "
+                  f"{share:6.1f} {stats.total:10.6f}", file=file)
+
+
+def write_collapsed(profile: Profile, path: str):
+    """One line per stack of node labels with its own time in microseconds,
+    the input format of flamegraph.pl and speedscope."""
+    with open(path, "w") as file:
+        for labels, seconds in profile.stacks.items():
+            file.write(f"{';'.join(labels)} {round(seconds * 1e6)}\n")
+
+
+def write_pstats(profile: Profile, path: str):
+    """The marshalled dict pstats.Stats loads, every (line, label) being a
+    function of the script."""
+    def function(key: tuple[int, str]) -> tuple[str, int, str]:
+        return (profile.script, key[0], key[1])
+
+    stats = {}
+    for key, numbers in profile.functions.items():
+        callers = {function(caller): (called.count, called.count, called.own,
+                                      called.total)
+                   for caller, called in profile.callers.get(key, {}).items()}
+        stats[function(key)] = (numbers.count, numbers.count, numbers.own,
+                                numbers.total, callers)
+    with open(path, "wb") as file:
+        marshal.dump(stats, file)
+
+
+def write_profile(profile: Profile, path: str):
+    if path.endswith((".prof", ".pstats")):
+        write_pstats(profile, path)
+    else:
+        write_collapsed(profile, path)
@@ -0,0 +1,148 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from lox.Expr import (LITERAL, Assign, Binary, Expr, ExprVisitor, Grouping,
+                      Literal, Unary, Variable, expr_dispatch_table)
+from lox.Stmt import Expression, Print, Stmt, StmtVisitor, Var, stmt_dispatch_table
+
+
+@dataclass
+class Resolver(ExprVisitor, StmtVisitor):
+    """Gives every variable a fixed slot before it is executed.
+
+    Each scope maps names to slots, looked up innermost first. Only the
+    global scope exists so far. A name used before any declaration gets a
+    slot too, it stays undefined and fails at runtime like before.
+    """
+    scopes: list[dict[str, int]] = field(default_factory=lambda: [{}])
+    slot_count: int = 0
+    # Every node resolved is evaluated once, this is what the program costs
+    nodes: int = 0
+    # How deep the nodes of the last statement nest, and the node being
+    # resolved now
+    max_depth: int = 0
+    depth: int = 0
+    # Nodes and finishing steps still to run, instead of the call stack
+    pending: list[tuple[Callable[[Any, Any], Any], Any, int]] = \
+        field(default_factory=list)
+    expr_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+    stmt_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+
+
+def create_resolver() -> Resolver:
+    resolver = Resolver(
+        visit_binary_expr=visit_binary_expr,  # type: ignore
+        visit_grouping_expr=visit_grouping_expr,  # type: ignore
+        visit_literal_expr=visit_literal_expr,  # type: ignore
+        visit_unary_expr=visit_unary_expr,  # type: ignore
+        visit_expression_stmt=visit_expression_stmt,  # type: ignore
+        visit_print_stmt=visit_print_stmt,  # type: ignore
+        visit_var_stmt=visit_var_stmt,  # type: ignore
+        visit_variable_expr=visit_variable_expr,  # type: ignore
+        visit_assign_expr=visit_assign_expr)  # type: ignore
+    resolver.expr_table = expr_dispatch_table(resolver)
+    resolver.stmt_table = stmt_dispatch_table(resolver)
+    return resolver
+
+
+def resolve(statements: list[Stmt], resolver: Resolver):
+    for statement in statements:
+        resolve_stmt(statement, resolver)
+
+
+def resolve_stmt(stmt: Stmt, resolver: Resolver):
+    # Visits push the children they want resolved, so nesting is only
+    # bounded by memory. Last pushed is resolved first.
+    resolver.nodes += 1
+    pending = resolver.pending
+    pending.append((resolver.stmt_table[stmt.kind], stmt, 0))
+    max_depth = 0
+    while pending:
+        visit, node, depth = pending.pop()
+        if depth > max_depth:
+            max_depth = depth
+        resolver.depth = depth
+        visit(node, resolver)
+    resolver.max_depth = max_depth
+
+
+def resolve_expr(expr: Expr, resolver: Resolver):
+    resolver.nodes += 1
+    if expr.kind == LITERAL:
+        # Nothing to resolve, and most common
+        return
+    resolver.pending.append((resolver.expr_table[expr.kind], expr,
+                             resolver.depth + 1))
+
+
+def resolve_later(finish: Callable[[Any, Any], Any], node: Expr | Stmt,
+                  resolver: Resolver):
+    # Runs finish once everything pushed after it is resolved
+    resolver.pending.append((finish, node, resolver.depth))
+
+
+def slot_for(name: str, resolver: Resolver) -> int:
+    for scope in reversed(resolver.scopes):
+        if name in scope:
+            return scope[name]
+
+    # Not declared yet, it belongs to the global scope
+    return declare(name, resolver, resolver.scopes[0])
+
+
+def declare(name: str, resolver: Resolver, scope: dict[str, int]) -> int:
+    slot = scope.get(name)
+    if slot is None:
+        slot = scope[name] = resolver.slot_count
+        resolver.slot_count += 1
+    return slot
+
+
+def visit_expression_stmt(stmt: Expression, resolver: Resolver):
+    resolve_expr(stmt.expression, resolver)
+
+
+def visit_print_stmt(stmt: Print, resolver: Resolver):
+    resolve_expr(stmt.expression, resolver)
+
+
+def visit_var_stmt(stmt: Var, resolver: Resolver):
+    # The initializer cannot see the variable it initializes
+    resolve_later(declare_var, stmt, resolver)
+    if stmt.initializer is not None:
+        resolve_expr(stmt.initializer, resolver)
+
+
+def declare_var(stmt: Var, resolver: Resolver):
+    stmt.slot = declare(stmt.name.lexeme, resolver, resolver.scopes[-1])
+
+
+def visit_assign_expr(expr: Assign, resolver: Resolver):
+    resolve_later(assign_slot, expr, resolver)
+    resolve_expr(expr.value, resolver)
+
+
+def assign_slot(expr: Assign, resolver: Resolver):
+    expr.slot = slot_for(expr.name.lexeme, resolver)
+
+
+def visit_variable_expr(expr: Variable, resolver: Resolver):
+    expr.slot = slot_for(expr.name.lexeme, resolver)
+
+
+def visit_literal_expr(expr: Literal, _: Resolver):
+    pass
+
+
+def visit_grouping_expr(expr: Grouping, resolver: Resolver):
+    resolve_expr(expr.expression, resolver)
+
+
+def visit_unary_expr(expr: Unary, resolver: Resolver):
+    resolve_expr(expr.right, resolver)
+
+
+def visit_binary_expr(expr: Binary, resolver: Resolver):
+    # Pushed last, the left operand is resolved first and gets its slots first
+    resolve_expr(expr.right, resolver)
+    resolve_expr(expr.left, resolver)
@@ -1,4 +1,10 @@
+import locale
+import mmap
+import os
+import re
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import BinaryIO, Iterator, TextIO
 from lox.error import error
 from lox.token import Token
 from lox.token_type import KEYWORDS, TokenType
@@ -39,7 +45,7 @@ class Cursor:
         return self.source[self.current + 1]
 
 
-def scan_tokens(source: str) -> list[Token]:
+def scan_tokens_cursor(source: str) -> list[Token]:
     cursor = Cursor(source)
     tokens: list[Token] = []
 
@@ -98,7 +104,7 @@ def scan_token(cursor: Cursor):
                 if cursor.match("=") else TokenType.GREATER)
         case "/":
             if cursor.match("/"):
-                while cursor.peek() != "\0":
+                while cursor.peek() != "\n" and not cursor.is_at_end():
                     cursor.advance()
                 return None
             else:
@@ -186,3 +192,221 @@ def create_token(cursor: Cursor,
                  literal: object | None = None):
     return Token(token_type, cursor.source[cursor.start: cursor.current],
                  literal, cursor.line)
+
+
+# Regex engine, one master pattern is tried at every position and the name of
+# the alternative that matched tells what to do with the lexeme. Blanks are
+# swallowed in front of every match instead of producing matches of their own.
+# The order of the alternatives matters: two character operators before single
+# ones and a terminated string before an unterminated one.
+OPERATORS = {
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "/": TokenType.SLASH,
+    "*": TokenType.STAR,
+    "!": TokenType.BANG,
+    "!=": TokenType.BANG_EQUAL,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+    "<": TokenType.LESS,
+    "<=": TokenType.LESS_EQUAL,
+}
+
+MASTER_PATTERN = re.compile(r"""
+  [ \t\r]*
+  (?:
+    (?P<newline>\n)
+  | (?P<comment>//[^\n]*)
+  | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>[0-9]+(?:\.[0-9]+)?)
+  | (?P<operator>[!=<>]=|[(){},.\-+;/*!=<>])
+  | (?P<string>"[^"]*")
+  | (?P<unterminated>"[^"]*)
+  | (?P<unexpected>[^ \t\r])
+  )
+""", re.VERBOSE | re.DOTALL)
+
+
+@dataclass
+class RegexState:
+    line: int = 1
+    consumed: int = 0
+
+
+def scan_tokens_regex(source: str) -> list[Token]:
+    state = RegexState()
+    tokens = list(regex_tokens(source, state, len(source)))
+    tokens.append(Token(TokenType.EOF, "", None, state.line))
+    return tokens
+
+
+def scan_token_stream(file: TextIO,
+                      chunk_size: int = 1 << 16) -> Iterator[Token]:
+    """Scan tokens lazily from a file object, reading it in chunks.
+
+    A match touching the last two characters of a chunk may still grow
+    ("!" into "!=", "1" into "1.5", unterminated strings), so it is left
+    pending and rescanned together with the next chunk.
+    """
+    state = RegexState()
+    pending = ""
+    while True:
+        chunk = file.read(chunk_size)
+        at_end = not chunk
+        buffer = pending + chunk
+        limit = len(buffer) if at_end else len(buffer) - 2
+
+        state.consumed = 0
+        yield from regex_tokens(buffer, state, limit)
+        pending = buffer[state.consumed:]
+
+        if at_end:
+            break
+
+    yield Token(TokenType.EOF, "", None, state.line)
+
+
+def regex_tokens(source: str, state: RegexState,
+                 limit: int) -> Iterator[Token]:
+    line = state.line
+    consumed = state.consumed
+
+    for match in MASTER_PATTERN.finditer(source, consumed):
+        if match.end() > limit:
+            break
+        consumed = match.end()
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        text = match.group(kind)
+        if kind == "identifier":
+            yield Token(KEYWORDS.get(text, TokenType.IDENTIFIER), text, None,
+                        line)
+        elif kind == "operator":
+            yield Token(OPERATORS[text], text, None, line)
+        elif kind == "number":
+            yield Token(TokenType.NUMBER, text, float(text), line)
+        elif kind == "newline":
+            line += 1
+        elif kind == "string":
+            line += text.count("\n")
+            yield Token(TokenType.STRING, text, text[1:-1], line)
+        elif kind == "unterminated":
+            line += text.count("\n")
+            error(line, "Unterminated String")
+        else:
+            error(line, "Unexpected Character")
+
+    state.line = line
+    state.consumed = consumed
+
+
+# Bytes engine, the same grammar as MASTER_PATTERN over raw UTF-8 so a
+# memory-mapped file can be scanned without decoding it first. A non ASCII
+# character is matched as a whole sequence to report it once, like the str
+# engines do. Any of \r\n, \r and \n ends a line, as they do for a file
+# read in text mode.
+BYTES_PATTERN = re.compile(rb"""
+  [ \t]*
+  (?:
+    (?P<newline>\r\n?|\n)
+  | (?P<comment>//[^\r\n]*)
+  | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>[0-9]+(?:\.[0-9]+)?)
+  | (?P<operator>[!=<>]=|[(){},.\-+;/*!=<>])
+  | (?P<string>"[^"]*")
+  | (?P<unterminated>"[^"]*)
+  | (?P<unexpected>[\xc0-\xff][\x80-\xbf]*|[^ \t\r])
+  )
+""", re.VERBOSE | re.DOTALL)
+
+BYTES_OPERATORS = {lexeme.encode(): (lexeme, token_type)
+                   for lexeme, token_type in OPERATORS.items()}
+
+
+def scan_tokens_bytes(source: bytes | mmap.mmap) -> list[Token]:
+    return list(bytes_tokens(source))
+
+
+def bytes_tokens(source: bytes | mmap.mmap) -> Iterator[Token]:
+    # Identifiers repeat a lot, decode each distinct one only once
+    identifiers: dict[bytes, tuple[str, TokenType]] = {}
+    # Strings are decoded like open() in text mode would
+    encoding = locale.getpreferredencoding(False)
+    line = 1
+
+    for match in BYTES_PATTERN.finditer(source):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        raw = match.group(kind)
+        if kind == "identifier":
+            known = identifiers.get(raw)
+            if known is None:
+                text = raw.decode("ascii")
+                known = identifiers[raw] = (
+                    text, KEYWORDS.get(text, TokenType.IDENTIFIER))
+            yield Token(known[1], known[0], None, line)
+        elif kind == "operator":
+            text, token_type = BYTES_OPERATORS[raw]
+            yield Token(token_type, text, None, line)
+        elif kind == "number":
+            yield Token(TokenType.NUMBER, raw.decode("ascii"), float(raw),
+                        line)
+        elif kind == "newline":
+            line += 1
+        elif kind == "string":
+            if b"\r" in raw:
+                raw = universal_newlines(raw)
+            line += raw.count(b"\n")
+            text = raw.decode(encoding)
+            yield Token(TokenType.STRING, text, text[1:-1], line)
+        elif kind == "unterminated":
+            line += universal_newlines(raw).count(b"\n")
+            error(line, "Unterminated String")
+        else:
+            error(line, "Unexpected Character")
+
+    yield Token(TokenType.EOF, "", None, line)
+
+
+def universal_newlines(raw: bytes) -> bytes:
+    return raw.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+
+def decode_source(data: bytes) -> str:
+    # What reading the file in text mode gives, so every input path scans
+    # the same text
+    text = data.decode(locale.getpreferredencoding(False))
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+@contextmanager
+def map_file(file: BinaryIO) -> Iterator[bytes | mmap.mmap]:
+    # mmap refuses empty files
+    if os.fstat(file.fileno()).st_size == 0:
+        yield b""
+        return
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+SCANNERS = {
+    "regex": scan_tokens_regex,
+    "cursor": scan_tokens_cursor,
+}
+
+
+def scan_tokens(source: str, engine: str = "regex") -> list[Token]:
+    return SCANNERS[engine](source)
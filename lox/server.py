@@ -0,0 +1,108 @@
+"""Keep an interpreter resident and run scripts sent over a Unix socket.
+
+A client sends one JSON line, {"path": "/abs/script.lox"} or
+{"source": "print 1;"}, and receives JSON lines back while the script runs:
+{"out": text} for what it prints, {"err": text} for stderr, and finally
+{"status": code} with the exit status python -m lox would have given.
+tool/lox_client.py is a client.
+"""
+import contextlib
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+from typing import BinaryIO
+
+from lox.scanner import scan_token_stream
+from lox.state import RunState, flush_output, use_state
+
+
+class FrameWriter(io.TextIOBase):
+    """A text stream sending everything written to it as frames of one kind."""
+
+    def __init__(self, connection: BinaryIO, kind: str):
+        self.connection = connection
+        self.kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            send(self.connection, {self.kind: text})
+        return len(text)
+
+
+def send(connection: BinaryIO, frame: dict):
+    connection.write(json.dumps(frame).encode() + b"\n")
+    connection.flush()
+
+
+class ScriptHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        # Runs in a process forked from the warm server, whatever the script
+        # does to the interpreter's state is gone when it ends.
+        from lox.__main__ import exit_on_error, governed, run_file, run_stream
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        options = self.server.options  # type: ignore
+
+        status = 0
+        stdout = FrameWriter(self.wfile, "out")
+        stderr = FrameWriter(self.wfile, "err")
+        with (use_state(RunState(output=stdout)),
+              contextlib.redirect_stdout(stdout),
+              contextlib.redirect_stderr(stderr)):
+            try:
+                if "path" in request:
+                    run_file(request["path"], options)
+                else:
+                    # Streamed like python -m lox - does, the statements
+                    # before a syntax error run
+                    source = io.StringIO(request["source"])
+                    run_stream(scan_token_stream(source), options,
+                               governed(options, None))
+                    exit_on_error()
+            except SystemExit as exit:
+                status = exit.code if isinstance(exit.code, int) else 1
+            except Exception as error:
+                print(f"{type(error).__name__}: {error}", file=stderr)
+                status = 1
+            finally:
+                flush_output()
+        send(self.wfile, {"status": status})
+
+
+class ScriptServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Forks a worker per script, at most max_children at a time."""
+
+    def __init__(self, path: str, options, jobs: int | None = None):
+        self.options = options
+        if jobs:
+            self.max_children = jobs
+        super().__init__(path, ScriptHandler)
+
+
+def serve(path: str, options, jobs: int | None = None):
+    # Imported here, so that every worker forks with it already loaded
+    import lox.__main__  # noqa: F401
+
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    # Stopped with kill as well, leave no socket behind then either
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with ScriptServer(path, options, jobs) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
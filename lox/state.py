@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, TextIO
+
+from lox.output import Sink, StreamSink
+
+
+@dataclass
+class RunState:
+    """Everything about a run that is not passed around explicitly.
+
+    output is where print statements and error reports go, None meaning
+    whatever sys.stdout is when they are written. They reach it through
+    sink, a buffering StreamSink on output unless another one is given.
+    """
+    had_error: bool = False
+    had_runtime_error: bool = False
+    output: TextIO | None = None
+    sink: Sink | None = None
+
+    def __post_init__(self):
+        if self.sink is None:
+            self.sink = StreamSink(self.output)
+
+
+# Each thread and each asyncio task sees its own current state
+CURRENT_STATE: ContextVar[RunState] = ContextVar("lox_state")
+
+
+def current_state() -> RunState:
+    try:
+        return CURRENT_STATE.get()
+    except LookupError:
+        # First use in this context, for example a new thread
+        state = RunState()
+        CURRENT_STATE.set(state)
+        return state
+
+
+@contextmanager
+def use_state(state: RunState) -> Iterator[RunState]:
+    token = CURRENT_STATE.set(state)
+    try:
+        yield state
+    finally:
+        CURRENT_STATE.reset(token)
+
+
+def current_sink() -> Sink:
+    return current_state().sink  # type: ignore
+
+
+def write_line(text: str):
+    current_sink().write_line(text)
+
+
+def flush_output():
+    current_sink().flush()
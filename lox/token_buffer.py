@@ -0,0 +1,166 @@
+from array import array
+from bisect import bisect_right
+
+from lox.error import error
+from lox.scanner import MASTER_PATTERN, OPERATORS
+from lox.token_type import KEYWORDS, TokenType
+
+TOKEN_TYPES = list(TokenType)
+TOKEN_KINDS = {token_type: kind for kind, token_type in enumerate(TOKEN_TYPES)}
+
+
+class TokenBuffer:
+    """Tokens stored as parallel columns of offsets into the source.
+
+    Nothing but the kind, the start and end offset and the line is kept per
+    token, lexemes and literals are sliced from the source when asked for.
+    Indexing returns a BufferedToken view, so the parser can consume the
+    buffer like a list of Token.
+    """
+
+    def __init__(self, source: str):
+        offset_code = "I" if len(source) < 2**32 else "Q"
+        self.source = source
+        self.kinds = array("B")
+        self.starts = array(offset_code)
+        self.ends = array(offset_code)
+        self.lines = array("I")
+        self.line_starts = array(offset_code, [0])
+        self.cached_index = -1
+        self.cached_token: BufferedToken | None = None
+
+    def append(self, token_type: TokenType, start: int, end: int, line: int):
+        self.kinds.append(TOKEN_KINDS[token_type])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> "BufferedToken":
+        # The parser peeks at the same token many times before advancing
+        if index != self.cached_index:
+            if index < 0:
+                index += len(self.kinds)
+            if not 0 <= index < len(self.kinds):
+                raise IndexError("token index out of range")
+            self.cached_index = index
+            self.cached_token = BufferedToken(
+                self, index, TOKEN_TYPES[self.kinds[index]])
+        return self.cached_token  # type: ignore
+
+    def token_type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def lexeme(self, index: int) -> str:
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def literal(self, index: int) -> object | None:
+        token_type = self.token_type(index)
+        if token_type == TokenType.NUMBER:
+            return float(self.lexeme(index))
+        if token_type == TokenType.STRING:
+            return self.source[self.starts[index] + 1:self.ends[index] - 1]
+        return None
+
+    def position(self, offset: int) -> tuple[int, int]:
+        """Line and column, both starting at 1, of an offset in the source."""
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+
+class BufferedToken:
+    """A Token shaped view of one entry in a TokenBuffer."""
+    __slots__ = ("buffer", "index", "token_type", "cached_lexeme")
+
+    def __init__(self, buffer: TokenBuffer, index: int, token_type: TokenType):
+        self.buffer = buffer
+        self.index = index
+        self.token_type = token_type
+        self.cached_lexeme: str | None = None
+
+    @property
+    def lexeme(self) -> str:
+        if self.cached_lexeme is None:
+            self.cached_lexeme = self.buffer.lexeme(self.index)
+        return self.cached_lexeme
+
+    @property
+    def literal(self) -> object | None:
+        return self.buffer.literal(self.index)
+
+    @property
+    def line(self) -> int:
+        return self.buffer.lines[self.index]
+
+    @property
+    def column(self) -> int:
+        return self.buffer.position(self.buffer.starts[self.index])[1]
+
+    def __str__(self):
+        return f"{self.token_type} {self.lexeme} {self.literal}"
+
+    def __repr__(self):
+        return (f"BufferedToken(token_type={self.token_type!r}, "
+                f"lexeme={self.lexeme!r}, line={self.line})")
+
+
+def scan_token_buffer(source: str) -> TokenBuffer:
+    buffer = TokenBuffer(source)
+    kinds = buffer.kinds
+    starts = buffer.starts
+    ends = buffer.ends
+    lines = buffer.lines
+    line_starts = buffer.line_starts
+    identifier = TOKEN_KINDS[TokenType.IDENTIFIER]
+    keywords = {text: TOKEN_KINDS[token_type]
+                for text, token_type in KEYWORDS.items()}
+    operators = {text: TOKEN_KINDS[token_type]
+                 for text, token_type in OPERATORS.items()}
+    number = TOKEN_KINDS[TokenType.NUMBER]
+    string = TOKEN_KINDS[TokenType.STRING]
+    line = 1
+
+    for match in MASTER_PATTERN.finditer(source):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        start, end = match.span(kind)
+        if kind == "identifier":
+            kinds.append(keywords.get(source[start:end], identifier))
+        elif kind == "operator":
+            kinds.append(operators[source[start:end]])
+        elif kind == "number":
+            kinds.append(number)
+        elif kind == "newline":
+            line += 1
+            line_starts.append(end)
+            continue
+        elif kind == "string":
+            line += record_line_starts(source, start, end, line_starts)
+            kinds.append(string)
+        elif kind == "unterminated":
+            line += record_line_starts(source, start, end, line_starts)
+            error(line, "Unterminated String")
+            continue
+        else:
+            error(line, "Unexpected Character")
+            continue
+        starts.append(start)
+        ends.append(end)
+        lines.append(line)
+
+    buffer.append(TokenType.EOF, len(source), len(source), line)
+    return buffer
+
+
+def record_line_starts(source: str, start: int, end: int,
+                       line_starts: array) -> int:
+    count = 0
+    newline = source.find("\n", start, end)
+    while newline != -1:
+        line_starts.append(newline + 1)
+        count += 1
+        newline = source.find("\n", newline + 1, end)
+    return count
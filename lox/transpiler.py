@@ -0,0 +1,283 @@
+import math
+from dataclasses import dataclass, field
+from types import CodeType, FunctionType
+from typing import Any, Callable, Iterable, Iterator
+
+from lox.Enviroment import UNDEFINED
+from lox.Expr import (Assign, Binary, ExprVisitor, Grouping, Literal, Unary,
+                      Variable, expr_dispatch_table)
+from lox.Stmt import (Expression, Print, Stmt, StmtVisitor, Var,
+                      stmt_dispatch_table)
+from lox.closures import number_literal
+from lox.error import runtimeError
+from lox.exceptions import RuntimeException
+from lox.interpreter import (Visitor, create_interpreter, execute,
+                             iterative_visitor, stringify)
+from lox.operations import is_equal
+from lox.resolver import resolve_stmt
+from lox.state import current_sink
+from lox.token import Token
+from lox.token_type import TokenType
+
+# Statements are compiled into functions of at most this many statements, so
+# that huge scripts do not become one huge code object.
+STATEMENTS_PER_UNIT = 1000
+
+# Parameters of every generated function. The runtime helpers, and the
+# builtins the type checks use, arrive as fast locals instead of globals.
+HELPERS = ("_v", "_U", "_print", "_stringify", "_equal", "_undefined",
+           "_assign", "_operand_error", "_operands_error", "type", "float",
+           "str")
+
+OPERATORS = {
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+    TokenType.SLASH: "/",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+
+@dataclass
+class Transpiler(ExprVisitor, StmtVisitor):
+    """Translates statements into the source of a Python function.
+
+    Each statement is written on the line of the Lox source it came from,
+    counted from first_line, the line of the first statement, and the code
+    object is moved there so it reports Lox line numbers. Tokens needed for error reports
+    are collected in tokens and passed to the helpers by index. Temporaries
+    are named after the nesting depth of their node, siblings reuse them.
+
+    defined holds the slots known to be defined before the statement being
+    translated runs, their reads skip the check. Without control flow that is
+    every slot defined when translation starts, and every slot declared by an
+    earlier statement, as a runtime error ends the whole unit.
+    """
+    line: int = 1
+    first_line: int = 1
+    depth: int = 0
+    defined: set[int] = field(default_factory=set)
+    tokens: list[Token] = field(default_factory=list)
+    expr_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+    stmt_table: list[Callable[[Any, Any], Any]] = field(default_factory=list)
+
+
+def create_transpiler() -> Transpiler:
+    transpiler = Transpiler(
+        visit_binary_expr=visit_binary_expr,  # type: ignore
+        visit_grouping_expr=visit_grouping_expr,  # type: ignore
+        visit_literal_expr=visit_literal_expr,  # type: ignore
+        visit_unary_expr=visit_unary_expr,  # type: ignore
+        visit_expression_stmt=visit_expression_stmt,  # type: ignore
+        visit_print_stmt=visit_print_stmt,  # type: ignore
+        visit_var_stmt=visit_var_stmt,  # type: ignore
+        visit_variable_expr=visit_variable_expr,  # type: ignore
+        visit_assign_expr=visit_assign_expr)  # type: ignore
+    transpiler.expr_table = expr_dispatch_table(transpiler)
+    transpiler.stmt_table = stmt_dispatch_table(transpiler)
+    return transpiler
+
+
+def interpret_python(statements: Iterable[Stmt],
+                     interpreter: Visitor | None = None,
+                     filename: str = "<lox>",
+                     unit_size: int = STATEMENTS_PER_UNIT):
+    if interpreter is None:
+        interpreter = create_interpreter()
+    resolver = interpreter.resolver
+    environment = interpreter.environment
+    defined = {slot for slot, value in enumerate(environment.values)
+               if value is not UNDEFINED}
+    try:
+        for unit in batches(statements, unit_size):
+            for statement in unit:
+                resolve_stmt(statement, resolver)
+            environment.reserve(resolver.slot_count)
+            try:
+                function, tokens = transpile(unit, filename, set(defined))
+            except (SyntaxError, RecursionError, MemoryError):
+                # Nesting deeper than CPython's parser takes, evaluate the
+                # unit without recursion instead.
+                deep = iterative_visitor(interpreter)
+                for statement in unit:
+                    execute(statement, deep)
+            else:
+                function(*runtime(environment.values, tokens))
+            defined.update(statement.slot for statement in unit
+                           if isinstance(statement, Var))
+    except RuntimeException as error:
+        runtimeError(error)
+
+
+def batches(statements: Iterable[Stmt], size: int) -> Iterator[list[Stmt]]:
+    batch = []
+    for statement in statements:
+        batch.append(statement)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def transpile(statements: list[Stmt], filename: str = "<lox>",
+              defined: set[int] | None = None) -> tuple[Callable, list[Token]]:
+    transpiler = create_transpiler()
+    if defined is not None:
+        transpiler.defined = defined
+    source = to_source(statements, transpiler)
+
+    # The header takes the first line, every Lox line L is on line
+    # L - first_line + 2 of the source. The line table being relative to the
+    # first line of the code object, moving that gives back the Lox numbering.
+    header = f"def lox_unit({', '.join(HELPERS)}):\n"
+    module = compile(header + source, filename, "exec")
+    code = next(constant for constant in module.co_consts
+                if isinstance(constant, CodeType))
+    code = code.replace(
+        co_firstlineno=code.co_firstlineno + transpiler.first_line - 2)
+    return FunctionType(code, {}), transpiler.tokens
+
+
+def to_source(statements: list[Stmt],
+              transpiler: Transpiler | None = None) -> str:
+    if transpiler is None:
+        transpiler = create_transpiler()
+    lines: list[list[str]] = [[]]
+    for index, statement in enumerate(statements):
+        code = transpiler.stmt_table[statement.kind](statement, transpiler)
+        if index == 0:
+            # Not padded from line 1, a unit late in the script would start
+            # with a blank line for every line before it
+            transpiler.first_line = transpiler.line
+        # Statements on one Lox line share it, joined by semicolons
+        while len(lines) <= transpiler.line - transpiler.first_line:
+            lines.append([])
+        lines[-1].append(code)
+    return "".join(" " + "; ".join(line) + "\n" if line else "\n"
+                   for line in lines)
+
+
+def runtime(values: list, tokens: list[Token]) -> tuple:
+
+    def undefined(index: int):
+        name = tokens[index]
+        raise RuntimeException(name, f"Undefined variable {name.lexeme}.")
+
+    def assign(slot: int, value: object, index: int):
+        if values[slot] is UNDEFINED:
+            undefined(index)
+        values[slot] = value
+        return value
+
+    def operand_error(index: int):
+        raise RuntimeException(tokens[index], "Must be a number")
+
+    def operands_error(index: int):
+        raise RuntimeException(tokens[index], "Operands must be a numbers")
+
+    # The sink is looked up once per unit instead of once per print
+    return (values, UNDEFINED, current_sink().write_line, stringify, is_equal, undefined,
+            assign, operand_error, operands_error, type, float, str)
+
+
+def token_index(token: Token, transpiler: Transpiler) -> int:
+    transpiler.tokens.append(token)
+    return len(transpiler.tokens) - 1
+
+
+def child(expr, transpiler: Transpiler) -> str:
+    transpiler.depth += 1
+    code = transpiler.expr_table[expr.kind](expr, transpiler)
+    transpiler.depth -= 1
+    return code
+
+
+def visit_expression_stmt(stmt: Expression, transpiler: Transpiler):
+    return child(stmt.expression, transpiler)
+
+
+def visit_print_stmt(stmt: Print, transpiler: Transpiler):
+    return f"_print(_stringify({child(stmt.expression, transpiler)}))"
+
+
+def visit_var_stmt(stmt: Var, transpiler: Transpiler):
+    if stmt.initializer is None:
+        value = "None"
+    else:
+        value = child(stmt.initializer, transpiler)
+    transpiler.line = stmt.name.line
+    transpiler.defined.add(stmt.slot)
+    return f"_v[{stmt.slot}] = {value}"
+
+
+def visit_assign_expr(expr: Assign, transpiler: Transpiler):
+    value = child(expr.value, transpiler)
+    transpiler.line = expr.name.line
+    return f"_assign({expr.slot}, {value}, {token_index(expr.name, transpiler)})"
+
+
+def visit_variable_expr(expr: Variable, transpiler: Transpiler):
+    transpiler.line = expr.name.line
+    if expr.slot in transpiler.defined:
+        return f"_v[{expr.slot}]"
+    value = f"_a{transpiler.depth}"
+    return (f"({value} if ({value} := _v[{expr.slot}]) is not _U"
+            f" else _undefined({token_index(expr.name, transpiler)}))")
+
+
+def visit_literal_expr(expr: Literal, _: Transpiler):
+    value = expr.value
+    if type(value) is float and not math.isfinite(value):
+        # Folding can produce these, they have no literal in Python
+        return "(1e999 - 1e999)" if math.isnan(value) else repr(value * 1e999)
+    return repr(value)
+
+
+def visit_grouping_expr(expr: Grouping, transpiler: Transpiler):
+    return transpiler.expr_table[expr.expression.kind](expr.expression,
+                                                        transpiler)
+
+
+def visit_unary_expr(expr: Unary, transpiler: Transpiler):
+    right = child(expr.right, transpiler)
+    transpiler.line = expr.operator.line
+    value = f"_a{transpiler.depth}"
+
+    if expr.operator.token_type == TokenType.BANG:
+        # not is_truthy(x) is x being nil or false
+        return f"(({value} := {right}) is None or {value} is False)"
+
+    return (f"(-{value} if type({value} := {right}) is float"
+            f" else _operand_error({token_index(expr.operator, transpiler)}))")
+
+
+def visit_binary_expr(expr: Binary, transpiler: Transpiler):
+    left = child(expr.left, transpiler)
+    right = child(expr.right, transpiler)
+    transpiler.line = expr.operator.line
+    token_type = expr.operator.token_type
+
+    if token_type == TokenType.EQUAL_EQUAL:
+        return f"_equal({left}, {right})"
+    if token_type == TokenType.BANG_EQUAL:
+        return f"(not _equal({left}, {right}))"
+
+    a = f"_a{transpiler.depth}"
+    b = f"_b{transpiler.depth}"
+    if token_type == TokenType.PLUS:
+        # Matches the tree walker, mixed operands evaluate to nil
+        return (f"({a} + {b} if type({a} := {left}) is type({b} := {right})"
+                f" and type({a}) in (float, str) else None)")
+
+    operator = OPERATORS[token_type]
+    error = f"_operands_error({token_index(expr.operator, transpiler)})"
+    # A number literal on the right needs no type check
+    if number_literal(expr.right) is not None:
+        return (f"({a} {operator} {right} if type({a} := {left}) is float"
+                f" else {error})")
+    # & instead of and, so the right operand is evaluated either way
+    return (f"({a} {operator} {b} if (type({a} := {left}) is float)"
+            f" & (type({b} := {right}) is float) else {error})")
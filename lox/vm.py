@@ -0,0 +1,161 @@
+from typing import Iterable
+
+from lox.compiler import (
+    OP_ADD, OP_CONSTANT, OP_DEFINE_GLOBAL, OP_DIVIDE, OP_EQUAL, OP_FALSE,
+    OP_GET_GLOBAL, OP_GREATER, OP_GREATER_EQUAL, OP_LESS, OP_LESS_EQUAL,
+    OP_MULTIPLY, OP_NEGATE, OP_NIL, OP_NOT, OP_NOT_EQUAL, OP_POP, OP_PRINT,
+    OP_RETURN, OP_SET_GLOBAL, OP_SUBTRACT, OP_TRUE, BINARY_OPCODES,
+    UNARY_OPCODES, Chunk)
+from lox.error import runtimeError
+from lox.exceptions import RuntimeException
+from lox.interpreter import stringify
+from lox.operations import is_equal, is_truthy
+from lox.state import write_line
+from lox.token import Token
+from lox.token_type import TokenType
+
+OPCODE_TOKENS = {opcode: token_type
+                 for token_type, opcode in BINARY_OPCODES.items()}
+OPCODE_TOKENS.update({opcode: token_type
+                      for token_type, opcode in UNARY_OPCODES.items()})
+
+
+def run_chunk(chunk: Chunk, globals: dict | None = None):
+    if globals is None:
+        globals = {}
+    try:
+        execute_chunk(chunk, globals)
+    except RuntimeException as error:
+        runtimeError(error)
+
+
+def run_chunks(chunks: Iterable[Chunk], globals: dict | None = None):
+    if globals is None:
+        globals = {}
+    try:
+        for chunk in chunks:
+            execute_chunk(chunk, globals)
+    except RuntimeException as error:
+        runtimeError(error)
+
+
+def execute_chunk(chunk: Chunk, globals: dict):
+    code = chunk.code
+    constants = chunk.constants
+    stack: list = []
+    push = stack.append
+    pop = stack.pop
+    ip = 0
+
+    while True:
+        op = code[ip]
+        ip += 1
+
+        if op == OP_CONSTANT:
+            push(constants[code[ip]])
+            ip += 1
+        elif op == OP_GET_GLOBAL:
+            name = constants[code[ip]]
+            ip += 1
+            if name not in globals:
+                raise chunk_error(chunk, ip - 2, name,
+                                  f"Undefined variable {name}.")
+            push(globals[name])
+        elif op == OP_ADD:
+            right = pop()
+            left = stack[-1]
+            if type(left) is float and type(right) is float:
+                stack[-1] = left + right
+            elif type(left) is str and type(right) is str:
+                stack[-1] = left + right
+            else:
+                # Matches the tree walker, mixed operands evaluate to nil
+                stack[-1] = None
+        elif op == OP_SUBTRACT:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left - right
+        elif op == OP_MULTIPLY:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left * right
+        elif op == OP_DIVIDE:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left / right
+        elif op == OP_SET_GLOBAL:
+            name = constants[code[ip]]
+            ip += 1
+            if name not in globals:
+                raise chunk_error(chunk, ip - 2, name,
+                                  f"Undefined variable {name}.")
+            globals[name] = stack[-1]
+        elif op == OP_DEFINE_GLOBAL:
+            globals[constants[code[ip]]] = pop()
+            ip += 1
+        elif op == OP_POP:
+            pop()
+        elif op == OP_GREATER:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left > right
+        elif op == OP_GREATER_EQUAL:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left >= right
+        elif op == OP_LESS:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left < right
+        elif op == OP_LESS_EQUAL:
+            right = pop()
+            left = stack[-1]
+            if type(left) is not float or type(right) is not float:
+                raise operands_error(chunk, ip - 1)
+            stack[-1] = left <= right
+        elif op == OP_EQUAL:
+            right = pop()
+            stack[-1] = is_equal(stack[-1], right)
+        elif op == OP_NOT_EQUAL:
+            right = pop()
+            stack[-1] = not is_equal(stack[-1], right)
+        elif op == OP_NEGATE:
+            if type(stack[-1]) is not float:
+                raise chunk_error(chunk, ip - 1, "", "Must be a number")
+            stack[-1] = -stack[-1]
+        elif op == OP_NOT:
+            stack[-1] = not is_truthy(stack[-1])
+        elif op == OP_NIL:
+            push(None)
+        elif op == OP_TRUE:
+            push(True)
+        elif op == OP_FALSE:
+            push(False)
+        elif op == OP_PRINT:
+            write_line(stringify(pop()))
+        elif op == OP_RETURN:
+            return
+
+
+def operands_error(chunk: Chunk, offset: int) -> RuntimeException:
+    return chunk_error(chunk, offset, "", "Operands must be a numbers")
+
+
+def chunk_error(chunk: Chunk, offset: int, lexeme: str,
+                message: str) -> RuntimeException:
+    # The chunk only keeps line numbers, rebuild a token for error reporting
+    token_type = OPCODE_TOKENS.get(chunk.code[offset], TokenType.IDENTIFIER)
+    token = Token(token_type, lexeme, None, chunk.lines[offset])
+    return RuntimeException(token, message)
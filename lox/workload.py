@@ -0,0 +1,387 @@
+"""Generate Lox programs of any size and see how each stage scales with it.
+
+    python -m lox.workload generate --size 10MB [shape options] -o big.lox
+    python -m lox.workload scaling --min 1KB --max 64MB [--factor 4]
+                                   [shape options] [--output curve.json]
+
+The shape options are --depth, --identifiers, --mix and --seed. Programs
+only use what lox.parser accepts and never fail at runtime, so the
+interpreter always runs them to the end.
+"""
+import argparse
+import contextlib
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterator
+
+from lox.interpreter import interpret
+from lox.output import MemorySink
+from lox.parser import parse
+from lox.scanner import SCANNERS, scan_tokens
+from lox.state import RunState, use_state
+
+NUMBER = "number"
+STRING = "string"
+BOOL = "bool"
+NIL = "nil"
+TYPES = (NUMBER, STRING, BOOL, NIL)
+
+UNITS = {"KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "B": 1}
+
+STAGES = ("scan", "parse", "interpret")
+
+WORDS = ("lox", "clox", "jlox", "token", "scanner", "parser", "tree", "walk")
+
+
+@dataclass
+class Workload:
+    """The shape of the generated programs.
+
+    depth is the height of every expression tree, identifiers the number of
+    distinct variable names, and mix the relative weight of each value type
+    among statements and literals.
+    """
+    depth: int = 3
+    identifiers: int = 100
+    mix: dict[str, float] | None = None
+    seed: int = 0
+
+
+@dataclass
+class Generator:
+    workload: Workload
+    rng: random.Random
+    weights: list[float]
+    # Declared names by the type of value they hold
+    declared: dict[str, list[str]]
+    next_name: int = 0
+
+
+def create_generator(workload: Workload) -> Generator:
+    mix = workload.mix or {NUMBER: 4, STRING: 1, BOOL: 2, NIL: 1}
+    return Generator(workload, random.Random(workload.seed),
+                     [mix.get(value_type, 0) for value_type in TYPES],
+                     {value_type: [] for value_type in TYPES})
+
+
+def statements(workload: Workload) -> Iterator[str]:
+    generator = create_generator(workload)
+    while True:
+        yield statement(generator)
+
+
+def generate(workload: Workload, size: int) -> Iterator[str]:
+    """Lines of a program of at least size bytes, one statement each."""
+    written = 0
+    for line in statements(workload):
+        if written >= size:
+            return
+        line += "\n"
+        written += len(line)
+        yield line
+
+
+def statement(generator: Generator) -> str:
+    rng = generator.rng
+    value_type = rng.choices(TYPES, generator.weights)[0]
+    depth = generator.workload.depth
+    names = generator.declared[value_type]
+
+    if generator.next_name < generator.workload.identifiers and (
+            not names or rng.random() < 0.3):
+        name = f"v{generator.next_name}"
+        generator.next_name += 1
+        declaration = f"var {name} = {expression(generator, value_type, depth, False)};"
+        names.append(name)
+        return declaration
+
+    choice = rng.random()
+    if names and choice < 0.5:
+        # Strings only take literals, reading variables would let them grow
+        # with every statement.
+        value = expression(generator, value_type, depth, value_type != STRING)
+        return f"{rng.choice(names)} = {value};"
+    if choice < 0.9:
+        return f"print {expression(generator, value_type, depth, True)};"
+    return f"{expression(generator, value_type, depth, True)};"
+
+
+# Binding strength of each level of the grammar, from lox.parser
+EQUALITY, COMPARISON, TERM, FACTOR, UNARY, PRIMARY = range(6)
+PRECEDENCE = {"==": EQUALITY, "!=": EQUALITY, "<": COMPARISON,
+              "<=": COMPARISON, ">": COMPARISON, ">=": COMPARISON,
+              "+": TERM, "-": TERM, "*": FACTOR, "/": FACTOR}
+
+# Source text of an expression and the precedence of its outermost operator
+Code = tuple[str, int]
+
+
+def expression(generator: Generator, value_type: str, depth: int,
+               variables: bool) -> str:
+    return node(generator, value_type, depth, variables)[0]
+
+
+def node(generator: Generator, value_type: str, depth: int,
+         variables: bool) -> Code:
+    rng = generator.rng
+    if depth == 0:
+        names = generator.declared[value_type]
+        if variables and names and rng.random() < 0.5:
+            return rng.choice(names), PRIMARY
+        return literal(generator, value_type), PRIMARY
+
+    def child(child_type: str = value_type) -> Code:
+        return node(generator, child_type, depth - 1, variables)
+
+    if value_type == NUMBER:
+        match rng.randrange(6):
+            case 0:
+                return unary("-", child())
+            case 1:
+                return grouping(child())
+            case 2:
+                # Only divide by a literal that is not zero
+                return binary(child(), "/", (str(rng.randint(1, 99)), PRIMARY))
+            case _:
+                return binary(child(), rng.choice("+-*"), child())
+    if value_type == STRING:
+        if rng.randrange(4) == 0:
+            return grouping(child())
+        return binary(child(), "+", child())
+    if value_type == BOOL:
+        match rng.randrange(4):
+            case 0:
+                return unary("!", child())
+            case 1:
+                operator = rng.choice(("<", "<=", ">", ">="))
+                return binary(child(NUMBER), operator, child(NUMBER))
+            case 2:
+                compared = rng.choice(TYPES)
+                operator = rng.choice(("==", "!="))
+                return binary(child(compared), operator, child(compared))
+            case _:
+                return grouping(child())
+    return grouping(child())
+
+
+def grouping(operand: Code) -> Code:
+    return f"({operand[0]})", PRIMARY
+
+
+def unary(operator: str, operand: Code) -> Code:
+    return f"{operator}{wrap(operand, UNARY)}", UNARY
+
+
+def binary(left: Code, operator: str, right: Code) -> Code:
+    # Operators associate to the left, so the right operand needs to bind
+    # strictly tighter to keep the shape of the tree.
+    precedence = PRECEDENCE[operator]
+    return (f"{wrap(left, precedence)} {operator} "
+            f"{wrap(right, precedence + 1)}", precedence)
+
+
+def wrap(operand: Code, minimum: int) -> str:
+    text, precedence = operand
+    return text if precedence >= minimum else f"({text})"
+
+
+def literal(generator: Generator, value_type: str) -> str:
+    rng = generator.rng
+    if value_type == NUMBER:
+        if rng.random() < 0.5:
+            return str(rng.randint(0, 1000))
+        return f"{rng.randint(0, 1000)}.{rng.randint(0, 99)}"
+    if value_type == STRING:
+        return f'"{" ".join(rng.choices(WORDS, k=rng.randint(1, 4)))}"'
+    if value_type == BOOL:
+        return rng.choice(("true", "false"))
+    return "nil"
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if size >= UNITS[unit]:
+            return f"{size / UNITS[unit]:g} {unit}"
+    return f"{size} B"
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        value_type, _, weight = part.partition("=")
+        if value_type not in TYPES:
+            raise argparse.ArgumentTypeError(
+                f"unknown type {value_type!r}, choose from {', '.join(TYPES)}")
+        mix[value_type] = float(weight)
+    return mix
+
+
+def measure(source: str, scanner: str, memory: bool) -> dict[str, dict]:
+    """Time, and optionally trace, every stage on one source."""
+    tokens: list = []
+    program: list = []
+
+    def scan():
+        tokens[:] = scan_tokens(source, scanner)
+
+    def parse_tokens():
+        program[:] = parse(tokens)
+
+    def run():
+        # A state per run, printing into memory is part of the timed cost
+        # and the lines go away with the state
+        with use_state(RunState(sink=MemorySink())):
+            interpret(program)
+
+    results = {}
+    for stage, function in zip(STAGES, (scan, parse_tokens, run)):
+        start = time.perf_counter()
+        function()
+        results[stage] = {"seconds": time.perf_counter() - start}
+        if memory:
+            tracemalloc.start()
+            function()
+            results[stage]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return results
+
+
+def measure_size(workload: Workload, size: int, scanner: str,
+                 memory: bool) -> dict:
+    # A fresh interpreter per size, so earlier sizes leave nothing behind
+    command = [sys.executable, "-m", "lox.workload", "measure",
+               "--size", str(size), "--scanner", scanner,
+               "--workload", json.dumps(asdict(workload))]
+    if not memory:
+        command.append("--no-memory")
+    output = subprocess.run(command, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output)
+
+
+def scaling(workload: Workload, sizes: list[int], scanner: str,
+            memory: bool, report: Callable[[str], None] = print) -> list[dict]:
+    rows = []
+    report(f"{'size':>10} {'stage':<10} {'seconds':>10} {'MB/s':>8} "
+           f"{'peak MB':>9} {'exponent':>9}")
+    previous: dict | None = None
+    for size in sizes:
+        row = {"size": size, "stages": measure_size(workload, size, scanner,
+                                                    memory)}
+        for stage in STAGES:
+            numbers = row["stages"][stage]
+            seconds = numbers["seconds"]
+            peak = ""
+            if "peak_bytes" in numbers:
+                peak = f"{numbers['peak_bytes'] / UNITS['MB']:.1f}"
+            # Slope of time against size on a log-log scale, about 1 while
+            # a stage is linear and about 2 once it is quadratic.
+            exponent = ""
+            if previous is not None:
+                before = previous["stages"][stage]["seconds"]
+                if before > 0 and seconds > 0:
+                    slope = (math.log(seconds / before)
+                             / math.log(size / previous["size"]))
+                    numbers["exponent"] = slope
+                    exponent = f"{slope:.2f}" + (" !" if slope > 1.3 else "")
+            report(f"{format_size(size):>10} {stage:<10} {seconds:10.4f} "
+                   f"{size / seconds / UNITS['MB']:8.2f} "
+                   f"{peak:>9} "
+                   f"{exponent:>9}")
+        rows.append(row)
+        previous = row
+    return rows
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--depth", type=int, default=3,
+                        help="height of every expression (default: 3)")
+    parser.add_argument("--identifiers", type=int, default=100,
+                        help="distinct variable names (default: 100)")
+    parser.add_argument("--mix", type=parse_mix,
+                        help="weights of value types, for example "
+                        "number=4,string=1,bool=2,nil=1")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def workload_from(args: argparse.Namespace) -> Workload:
+    return Workload(depth=args.depth, identifiers=args.identifiers,
+                    mix=args.mix, seed=args.seed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="python -m lox.workload")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser(
+        "generate", help="write one program")
+    generate_parser.add_argument("--size", type=parse_size, default="1MB",
+                                 help="at least this many bytes, e.g. 1KB, "
+                                 "64MB or 1GB (default: 1MB)")
+    generate_parser.add_argument("-o", "--output",
+                                 help="file to write, stdout by default")
+    add_shape_arguments(generate_parser)
+
+    scaling_parser = commands.add_parser(
+        "scaling", help="time every stage over growing programs")
+    scaling_parser.add_argument("--min", type=parse_size, default="1KB")
+    scaling_parser.add_argument("--max", type=parse_size, default="16MB")
+    scaling_parser.add_argument("--factor", type=int, default=4,
+                                help="growth from one size to the next")
+    scaling_parser.add_argument("--scanner", choices=tuple(SCANNERS),
+                                default="regex")
+    scaling_parser.add_argument("--no-memory", action="store_false",
+                                dest="memory",
+                                help="skip the tracemalloc run per stage")
+    scaling_parser.add_argument("--output", help="write the rows as JSON")
+    add_shape_arguments(scaling_parser)
+
+    # Run by scaling in a child process, one per size
+    measure_parser = commands.add_parser("measure")
+    measure_parser.add_argument("--size", type=int, required=True)
+    measure_parser.add_argument("--scanner", default="regex")
+    measure_parser.add_argument("--workload", type=json.loads, required=True)
+    measure_parser.add_argument("--no-memory", action="store_false",
+                                dest="memory")
+
+    args = arg_parser.parse_args()
+
+    if args.command == "generate":
+        workload = workload_from(args)
+        with (open(args.output, "w") if args.output
+              else contextlib.nullcontext(sys.stdout)) as file:
+            file.writelines(generate(workload, args.size))
+    elif args.command == "scaling":
+        workload = workload_from(args)
+        sizes = []
+        size = args.min
+        while size <= args.max:
+            sizes.append(size)
+            size *= args.factor
+        rows = scaling(workload, sizes, args.scanner, args.memory)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump({"workload": asdict(workload),
+                           "scanner": args.scanner, "rows": rows},
+                          file, indent=2)
+    else:
+        source = "".join(generate(Workload(**args.workload), args.size))
+        print(json.dumps(measure(source, args.scanner, args.memory)))
+
+
+if __name__ == "__main__":
+    main()
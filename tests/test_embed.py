@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import unittest
+
+from lox.embed import Interpreter
+from lox.output import MemorySink
+from lox.parser import parse
+from lox.scanner import scan_tokens
+
+# Long enough for a task to still be running after its first few yields
+LONG_SCRIPT = "var a = 0;\n" + "a = a + 1;\n" * 20000 + "print a;"
+
+
+class OverlappingRunsTest(unittest.TestCase):
+
+    def test_thread_is_refused_while_a_task_runs(self):
+        interpreter = Interpreter(sink=MemorySink())
+        errors = []
+
+        def run_in_thread():
+            try:
+                interpreter.run("print 99;")
+            except RuntimeError as error:
+                errors.append(error)
+
+        async def main():
+            task = asyncio.create_task(interpreter.run_async(LONG_SCRIPT, 10))
+            await asyncio.sleep(0.01)
+            thread = threading.Thread(target=run_in_thread)
+            thread.start()
+            while thread.is_alive():
+                await asyncio.sleep(0.001)
+            return await task
+
+        self.assertEqual(asyncio.run(main()), 0)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(interpreter.sink.lines, ["20000"])
+
+    def test_task_is_refused_while_a_thread_runs(self):
+        interpreter = Interpreter(sink=MemorySink())
+        started = threading.Event()
+        interpreter.sink.write_line = lambda text: started.set()
+        thread = threading.Thread(
+            target=interpreter.run, args=("print 0;\n" + LONG_SCRIPT,))
+        thread.start()
+        started.wait()
+        with self.assertRaises(RuntimeError):
+            asyncio.run(interpreter.run_async("print 1;"))
+        thread.join()
+        self.assertEqual(asyncio.run(interpreter.run_async("a = 1;")), 0)
+
+
+class LongStatementTest(unittest.TestCase):
+
+    def test_timeout_stops_a_single_deep_statement(self):
+        source = "print " + "(" * 50000 + "+".join(["1"] * 50000) \
+            + ")" * 50000 + ";"
+        statements = parse(scan_tokens(source))
+        interpreter = Interpreter(sink=MemorySink())
+
+        async def main():
+            async with asyncio.timeout(0.02):
+                await interpreter.execute_async(statements, 100)
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(main())
+        # Cancelled before the statement printed its value
+        self.assertEqual(interpreter.sink.lines, [])
+        self.assertEqual(asyncio.run(interpreter.run_async("print 2;")), 0)
+        self.assertEqual(interpreter.sink.lines, ["2"])
+
+class DeepNestingTest(unittest.TestCase):
+
+    def test_every_backend_runs_deep_statements(self):
+        source = "var a = 2;\nprint " + "-" * 3000 + "a;\nprint " \
+            + "(" * 3000 + "a + 1" + ")" * 3000 + ";"
+        for backend in ("tree", "vm", "arena", "closure", "python"):
+            for optimize in (0, 2):
+                with self.subTest(backend=backend, optimize=optimize):
+                    interpreter = Interpreter(backend, optimize=optimize,
+                                              sink=MemorySink())
+                    self.assertEqual(interpreter.run(source), 0)
+                    self.assertEqual(interpreter.sink.lines, ["2", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from lox.cache import MIN_SIZE
+from lox.embed import Interpreter
+from lox.governor import Governor
+from lox.output import MemorySink
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_lox(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-m", "lox", *args], cwd=ROOT,
+                          capture_output=True, text=True)
+
+
+class OptimizedStringQuotaTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.script = Path(directory.name) / "concat.lox"
+        # Long enough to be cached
+        padding = "//" + " " * MIN_SIZE + "\n"
+        self.script.write_text(padding + 'print "aaaa" + "bbbb";\n')
+
+    def test_folding_keeps_the_string_quota(self):
+        for flags in (["-O"], ["-OO"], ["-O", "--no-cache"],
+                      ["-O", "--stream"]):
+            with self.subTest(flags=flags):
+                result = run_lox(*flags, "--max-string", "3",
+                                 str(self.script))
+                self.assertEqual(result.returncode, 70)
+                self.assertNotIn("aaaabbbb", result.stdout)
+                self.assertIn("String longer than 3 characters.",
+                              result.stdout)
+
+    def test_cache_of_an_unlimited_run_is_not_used(self):
+        self.assertEqual(run_lox("-O", str(self.script)).stdout, "aaaabbbb\n")
+        result = run_lox("-O", "--max-string", "3", str(self.script))
+        self.assertEqual(result.returncode, 70)
+        self.assertNotIn("aaaabbbb", result.stdout)
+
+
+class BudgetPerRunTest(unittest.TestCase):
+
+    def test_each_run_gets_its_own_time(self):
+        governor = Governor(seconds=0.2)
+        interpreter = Interpreter(governor=governor, sink=MemorySink())
+        self.assertEqual(interpreter.run("print 1;"), 0)
+        time.sleep(0.3)
+        self.assertEqual(interpreter.run("print 2;"), 0)
+        self.assertEqual(Interpreter(governor=governor).run("var a;"), 0)
+        self.assertEqual(interpreter.sink.lines, ["1", "2"])
+
+    def test_nodes_are_counted_per_run(self):
+        interpreter = Interpreter(governor=Governor(max_nodes=5),
+                                  sink=MemorySink())
+        for _ in range(3):
+            self.assertEqual(interpreter.run("var a = 1 + 2;"), 0)
+        self.assertEqual(interpreter.run("print 1 + 1 + 1 + 1;"), 70)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+from lox.Stmt import Expression, Print, Stmt
+from lox.ast_printer import ast_printer
+from lox.output import MemorySink
+from lox.parser import parse
+from lox.scanner import scan_tokens
+from lox.state import RunState, use_state
+
+# Deep enough that any recursion per level would pass the recursion limit
+DEPTH = 3000
+
+# Source and the tree of every statement, None for one that failed to
+# parse. BROKEN also lists the errors reported.
+VALID = [
+    ("1 + 2 * 3 - 4 / 5;", ["(; (- (+ 1.0 (* 2.0 3.0)) (/ 4.0 5.0)))"]),
+    ("a - b - c;", ["(; (- (- a b) c))"]),
+    ("1 < 2 == 3 >= 4 != true;",
+     ["(; (!= (== (< 1.0 2.0) (>= 3.0 4.0)) True))"]),
+    ("!!-x;", ["(; (! (! (- x))))"]),
+    ("- -1;", ["(; (- (- 1.0)))"]),
+    ("(1 + 2) * (3);", ["(; (* (group (+ 1.0 2.0)) (group 3.0)))"]),
+    ("a = b = c = 1;", ["(; (= a (= b (= c 1.0))))"]),
+    ("a = b + 1 == c;", ["(; (= a (== (+ b 1.0) c)))"]),
+    ('var x = "s" + nil;', ["(var x (+ s nil))"]),
+    ("var y;", ["(var y)"]),
+    ('print "hi" + false;', ["(print (+ hi False))"]),
+    ("print 1; var z = 2; z = z * 2;",
+     ["(print 1.0)", "(var z 2.0)", "(; (= z (* z 2.0)))"]),
+    ("(" * DEPTH + "1" + ")" * DEPTH + ";",
+     ["(; " + "(group " * DEPTH + "1.0" + ")" * DEPTH + ")"]),
+    ("-" * DEPTH + "1;", ["(; " + "(- " * DEPTH + "1.0" + ")" * DEPTH + ")"]),
+    ("1" + " + 1" * DEPTH + ";",
+     ["(; " + "(+ " * DEPTH + "1.0" + " 1.0)" * DEPTH + ")"]),
+    ("a = " * DEPTH + "1;",
+     ["(; " + "(= a " * DEPTH + "1.0" + ")" * DEPTH + ")"]),
+]
+
+BROKEN = [
+    ("1 +;", [None], ["[1] Error at ';': Expected Expression"]),
+    ("(1 + 2;", [None], ["[1] Error at ';': Expected ) after expression"]),
+    ("a + b = 1;", ["(; (+ a b))"],
+     ["[1] Error at '=': Invalid Assignment Target"]),
+    ("(a) = 1;", ["(; (group a))"],
+     ["[1] Error at '=': Invalid Assignment Target"]),
+    ("!(a = b) = c;", ["(; (! (group (= a b))))"],
+     ["[1] Error at '=': Invalid Assignment Target"]),
+    ("print 1", [None], ["[1] Error  at end: Expect ';' after value"]),
+    ("var = 1;", [None], ["[1] Error at '=': Expect variable name."]),
+    ("var x = 1", [None],
+     ["[1] Error  at end: Expect ';' after variable declaration"]),
+    ("1 2;", [None], ["[1] Error at '2': Expect ';' after expression"]),
+    (")", [None], ["[1] Error at ')': Expected Expression"]),
+    ("var a = ;", [None], ["[1] Error at ';': Expected Expression"]),
+    ("print;", [None], ["[1] Error at ';': Expected Expression"]),
+    ("-;", [None], ["[1] Error at ';': Expected Expression"]),
+    ("a = ;", [None], ["[1] Error at ';': Expected Expression"]),
+    ("1 +; print 2;", [None, "(print 2.0)"],
+     ["[1] Error at ';': Expected Expression"]),
+    ("print 1;\n(2\n;\nprint 3;", ["(print 1.0)", None, "(print 3.0)"],
+     ["[3] Error at ';': Expected ) after expression"]),
+    ("(" * DEPTH + "1;", [None],
+     ["[1] Error at ';': Expected ) after expression"]),
+    ("(" * DEPTH + "a" + ")" * DEPTH + " = 1;",
+     ["(; " + "(group " * DEPTH + "a" + ")" * DEPTH + ")"],
+     ["[1] Error at '=': Invalid Assignment Target"]),
+]
+
+
+def describe(stmt: Stmt | None) -> str | None:
+    if stmt is None:
+        return None
+    if isinstance(stmt, Print):
+        return f"(print {ast_printer(stmt.expression)})"
+    if isinstance(stmt, Expression):
+        return f"(; {ast_printer(stmt.expression)})"
+    if stmt.initializer is None:
+        return f"(var {stmt.name.lexeme})"
+    return f"(var {stmt.name.lexeme} {ast_printer(stmt.initializer)})"
+
+
+def parse_source(source: str) -> tuple[list[str | None], list[str]]:
+    sink = MemorySink()
+    with use_state(RunState(sink=sink)):
+        statements = parse(scan_tokens(source))
+    return [describe(statement) for statement in statements], sink.lines
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_valid_sources(self):
+        for source, trees in VALID:
+            with self.subTest(source=source[:40]):
+                self.assertEqual(parse_source(source), (trees, []))
+
+    def test_broken_sources(self):
+        for source, trees, errors in BROKEN:
+            with self.subTest(source=source[:40]):
+                self.assertEqual(parse_source(source), (trees, errors))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import contextlib
+import io
+import sys
+
+sys.path.insert(0, ".")
+
+from lox.scanner import SCANNERS  # noqa: E402
+
+
+def scan_with(engine: str, source: str):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        tokens = SCANNERS[engine](source)
+    return tokens, output.getvalue()
+
+
+def compare(path: str) -> bool:
+    with open(path, "r") as file:
+        source = file.read()
+
+    expected_tokens, expected_errors = scan_with("cursor", source)
+    actual_tokens, actual_errors = scan_with("regex", source)
+
+    if expected_errors != actual_errors:
+        print(f"{path}: error reports differ")
+        return False
+
+    for index, (expected, actual) in enumerate(
+            zip(expected_tokens, actual_tokens)):
+        if expected != actual:
+            print(f"{path}: token {index} differs: {expected!r} != {actual!r}")
+            return False
+
+    if len(expected_tokens) != len(actual_tokens):
+        print(f"{path}: token count differs")
+        return False
+
+    return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python tool/compare_scanners.py <SCRIPT>...")
+        sys.exit(64)
+
+    results = [compare(path) for path in sys.argv[1:]]
+    if not all(results):
+        sys.exit(1)
+    print(f"{len(results)} file(s) scan identically")
@@ -1,43 +1,50 @@
 import sys
 
 EXPR_TYPES = [
-    "Assign - name: Token, value: Expr",
-    "Binary - left: Expr, operator: Token, right: Expr",
+    "Assign - name: Token, value: Expr, slot: int = -1",
+    "Binary - left: Expr, operator: Token, right: Expr, operation: Callable | None = None",
     "Grouping - expression: Expr",
     "Literal - value: object",
-    "Unary - operator: Token, right: Expr",
-    "Variable - name: Token"
+    "Unary - operator: Token, right: Expr, operation: Callable | None = None",
+    "Variable - name: Token, slot: int = -1"
 ]
 
 STATEMENT_TYPES = [
-    "Expression - expression: Expr",
-    "Print - expression: Expr",
-    "Var - name: Token, initializer: Expr | None"
+    "Expression - expression: Expr, line: int = 0",
+    "Print - expression: Expr, line: int = 0",
+    "Var - name: Token, initializer: Expr | None, slot: int = -1"
 ]
 
 def define_ast(output_dir: str, base_name: str, types: list[str]):
 
     contents = []
     contents.append("from dataclasses import dataclass")
-    contents.append("from typing import Any, Callable")
+    contents.append("from typing import Any, Callable, ClassVar")
     contents.append("")
+    if base_name != "Expr":
+        contents.append("from lox.Expr import Expr")
     contents.append("from lox.token import Token")
     contents.append("")
+    define_kinds(contents, types)
     contents.append("")
-    contents.append("@dataclass")
+    contents.append("")
+    contents.append("@dataclass(slots=True)")
     contents.append(f"class {base_name}:")
+    contents.append("    kind: ClassVar[int] = -1")
+    contents.append("")
     contents.append(f'    def accept(self, visitor: "{base_name}Visitor")-> "{base_name}":')
     contents.append(f"        return {base_name}()")
     contents.append("")
     contents.append("")
 
     for type in types:
-        class_name = type.split("-")[0].strip()
-        fields = type.split("-")[1].strip()
+        class_name = type.split(" - ", 1)[0].strip()
+        fields = type.split(" - ", 1)[1].strip()
 
         define_type(contents, base_name, class_name, fields)
 
     define_visitor(contents, base_name, types)
+    define_dispatch_table(contents, base_name, types)
 
     file_path = f"{output_dir}/{base_name}.py"
     with open(file_path, "+w") as file:
@@ -45,9 +52,17 @@ def define_ast(output_dir: str, base_name: str, types: list[str]):
         file.writelines(contents)
 
 
+def define_kinds(contents: list[str], types: list[str]):
+    # Integer tags, the index of each class in the dispatch table
+    for kind, type in enumerate(types):
+        class_name = type.split(" - ", 1)[0].strip()
+        contents.append(f"{class_name.upper()} = {kind}")
+
+
 def define_type(contents: list[str], base_name: str, class_name: str, fields: str):
-    contents.append("@dataclass")
+    contents.append("@dataclass(slots=True)")
     contents.append(f"class {class_name}({base_name}):")
+    contents.append(f"    kind: ClassVar[int] = {class_name.upper()}")
     for field in fields.split(","):
         contents.append(f"    {field.strip()}")
     
@@ -64,10 +79,20 @@ def define_visitor(contents: list[str], base_name: str, types: list[str]):
     contents.append("@dataclass")
     contents.append(f"class {base_name}Visitor:")
     for type in types:
-        class_name = type.split("-")[0].strip()
+        class_name = type.split(" - ", 1)[0].strip()
         contents.append(f'    visit_{class_name.lower()}_{base_name.lower()}: Callable[[{class_name}, "{base_name}Visitor"], Any]')
     
     contents.append("")
+
+
+def define_dispatch_table(contents: list[str], base_name: str, types: list[str]):
+    contents.append("")
+    contents.append(f'def {base_name.lower()}_dispatch_table(visitor: {base_name}Visitor) -> list[Callable[[Any, Any], Any]]:')
+    contents.append("    return [")
+    for type in types:
+        class_name = type.split(" - ", 1)[0].strip()
+        contents.append(f"        visitor.visit_{class_name.lower()}_{base_name.lower()},")
+    contents.append("    ]")
     
 
 
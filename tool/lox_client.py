@@ -0,0 +1,52 @@
+"""Run a script on a server started with python -m lox --serve SOCKET.
+
+    python tool/lox_client.py [--socket SOCKET] script.lox
+    python tool/lox_client.py [--socket SOCKET] - < script.lox
+
+Prints what the script prints and exits with its status, like running it
+with python -m lox. It imports nothing from lox, so it starts in the time
+Python itself needs. The socket defaults to $LOX_SOCKET.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="lox-client")
+    arg_parser.add_argument("script", help="script to run, '-' sends stdin")
+    arg_parser.add_argument("--socket", default=os.environ.get("LOX_SOCKET"),
+                            help="socket of the server (default: $LOX_SOCKET)")
+    args = arg_parser.parse_args()
+    if not args.socket:
+        arg_parser.error("no --socket given and LOX_SOCKET is not set")
+
+    if args.script == "-":
+        request = {"source": sys.stdin.read()}
+    else:
+        # The server has its own working directory
+        request = {"path": os.path.abspath(args.script)}
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(args.socket)
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        with connection.makefile("rb") as frames:
+            for line in frames:
+                frame = json.loads(line)
+                if "out" in frame:
+                    sys.stdout.write(frame["out"])
+                    sys.stdout.flush()
+                elif "err" in frame:
+                    sys.stderr.write(frame["err"])
+                elif "status" in frame:
+                    sys.exit(frame["status"])
+
+    # The connection ended without a status, the worker died
+    print("lox-client: server closed the connection", file=sys.stderr)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()